@@ -1,4 +1,9 @@
 import streamlit as st
+import pandas as pd
+from datalayer.warmup import start_background, warmup_status
+
+# Warm every page's data in the background, once per server process
+start_background()
 
 st.header('En sida med visualiseringar av data för olika områden')
 
@@ -18,3 +23,13 @@ with col1:
 with col2:
     st.image('chart1.png')
 
+
+with st.expander('Cachestatus'):
+    status = warmup_status()
+    if status:
+        st.dataframe(pd.DataFrame([
+            {'Data': name, 'Status': task.state, 'Sekunder': task.seconds, 'Fel': task.error}
+            for name, task in status.items()
+        ]))
+    else:
+        st.write('Uppvärmningen har inte startat än.')
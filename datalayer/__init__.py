@@ -0,0 +1 @@
+"""Shared data access for the Falkenberg dashboards and the update_bigQuery loaders."""
@@ -0,0 +1,142 @@
+"""Precomputed, ready-to-plot aggregates of the population snapshots.
+
+Each aggregate is derived from one or more snapshots (see ``datalayer.snapshots``)
+and stored in the same snapshot directory and manifest. An aggregate records the
+fetch time of the snapshots it was built from and is rebuilt on the next read
+once any of them has been re-synced, so the pages only ever load a few hundred
+pre-aggregated rows instead of reshaping the raw tables on every rerun. While
+BigQuery cannot be reached, stale sources are kept for another max age (see
+``datalayer.snapshots``) and the aggregate built from them with them.
+
+``python -m datalayer.snapshots sync`` rebuilds all aggregates after syncing.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Callable, Iterable, Sequence
+
+import pandas as pd
+
+from datalayer.snapshots import (
+    OFFLINE,
+    is_stale,
+    load_snapshot_file,
+    read_manifest,
+    read_snapshot,
+    write_snapshot,
+)
+
+UNDER_20 = ['-4', '5-9', '10-14', '15-19']
+OVER_75 = ['75-79', '80-']
+
+
+def age_groups(df: pd.DataFrame, round_values: bool = False) -> pd.DataFrame:
+    """Population per 10-year age group and year, with the labels page 1 plots.
+
+    ``df`` has one row per ``alder`` (e.g. ``'42'`` or ``'100+'``) and ``ar``.
+    """
+    age_group = (df['alder'].str.replace('+', '', regex=False).astype(int) // 10) * 10
+    grouped = df.groupby([age_group.rename('age_group'), 'ar'])['folkmangd'].sum()
+    if round_values:
+        grouped = grouped.round()
+    grouped = grouped.reset_index()
+    grouped['age_group_label'] = (
+        grouped['age_group'].astype(str) + '-' + (grouped['age_group'] + 9).astype(str) + ' år'
+    ).str.replace('-109', '+', regex=False)
+    return grouped.rename(columns={
+        'age_group': 'Åldersgrupp',
+        'ar': 'År',
+        'folkmangd': 'Befolkningsmängd',
+        'age_group_label': 'Åldersgrupper',
+    })
+
+
+def regso_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Population per regso and year, with the under-20 and over-75 counts and shares."""
+    frame = df.assign(
+        folkmangd_over_75=df['folkmangd'].where(df['alder'].isin(OVER_75), 0),
+        folkmangd_under_20=df['folkmangd'].where(df['alder'].isin(UNDER_20), 0),
+    )
+    # regso is categorical, only keep the combinations that occur
+    totals = frame.groupby(['ar', 'regso'], as_index=False, observed=True)[
+        ['folkmangd', 'folkmangd_over_75', 'folkmangd_under_20']
+    ].sum()
+    totals['folkmangd_under_20%'] = (totals['folkmangd_under_20'] / totals['folkmangd']) * 100
+    totals['folkmangd_over_75%'] = (totals['folkmangd_over_75'] / totals['folkmangd']) * 100
+    return totals
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    sources: tuple[str, ...]
+    build: Callable[..., pd.DataFrame]
+
+
+AGGREGATES = {
+    'agg.folkmangd_aldersgrupp': Aggregate(
+        ('scb_befolkning.folkmangd_falkenberg',),
+        age_groups,
+    ),
+    'agg.folkmangd_prognos_aldersgrupp': Aggregate(
+        ('scb_befolkning.folkmangd_prognos_falkenberg',),
+        lambda df: age_groups(df, round_values=True),
+    ),
+    'agg.regso_folkmangd': Aggregate(
+        ('scb_befolkning.regso_folkmangd',),
+        regso_totals,
+    ),
+    'agg.regso_folkmangd_halland': Aggregate(
+        ('scb_befolkning.regso_folkmangd_halland',),
+        regso_totals,
+    ),
+}
+
+_lock = threading.Lock()
+
+
+def build_aggregate(name: str) -> dict:
+    """Rebuild aggregate ``name`` from its source snapshots, unless they are unchanged."""
+    aggregate = AGGREGATES[name]
+    frames = [read_snapshot(source) for source in aggregate.sources]
+    manifest = read_manifest()
+    sources = {source: manifest[source]['fetched_at'] for source in aggregate.sources}
+    entry = manifest.get(name)
+    # The sources could not be refreshed and are served as they were, so is the aggregate
+    if entry is not None and entry.get('sources') == sources:
+        return entry
+    return write_snapshot(name, aggregate.build(*frames), sources=sources)
+
+
+def aggregate_sources(*names: str) -> list[str]:
+    """Snapshots the given aggregates are built from, e.g. for ``refresh_snapshots``."""
+    return [source for name in names for source in AGGREGATES[name].sources]
+
+
+def build_aggregates(names: Iterable[str] | None = None) -> dict[str, dict]:
+    return {name: build_aggregate(name) for name in (names or AGGREGATES)}
+
+
+def _needs_rebuild(name: str, manifest: dict[str, dict]) -> bool:
+    entry = manifest.get(name)
+    if entry is None:
+        return True
+    for source, fetched_at in entry.get('sources', {}).items():
+        source_entry = manifest.get(source)
+        if source_entry is None or source_entry['fetched_at'] != fetched_at:
+            return True
+        if not OFFLINE and is_stale(source, source_entry):
+            return True
+    return False
+
+
+def read_aggregate(name: str, columns: Sequence[str] | None = None) -> pd.DataFrame:
+    """Return aggregate ``name``, rebuilding it first if its sources have changed."""
+    manifest = read_manifest()
+    if _needs_rebuild(name, manifest):
+        with _lock:
+            manifest = read_manifest()
+            if _needs_rebuild(name, manifest):
+                build_aggregate(name)
+            manifest = read_manifest()
+    return load_snapshot_file(name, manifest[name], columns)
@@ -0,0 +1,137 @@
+"""Smaller payloads for animated Plotly figures.
+
+``plotly.express`` writes a full copy of every trace into every animation frame,
+including attributes that never change (colors, hover templates, text position,
+legend groups ...). For a forecast with one frame per year up to 2070, or a
+scatter with one trace per municipality, that makes the browser payload several
+megabytes.
+
+``optimize_animation`` can keep only every Nth frame (plus the last one) and
+removes attributes from the frames that are identical in every frame and in the
+initial trace; plotly.js keeps a trace's current value for anything a frame
+does not set, so the rendered animation is unchanged.
+"""
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+
+logger = logging.getLogger(__name__)
+
+# Trace keys that always stay in the frames
+_KEEP = {"type"}
+
+_MISSING = object()
+
+
+@dataclass
+class PayloadReport:
+    frames_before: int
+    frames_after: int
+    bytes_before: int
+    bytes_after: int
+
+
+_reports: dict[str, PayloadReport] = {}
+
+
+def payload_size(fig: go.Figure | dict) -> int:
+    """Size in bytes of the JSON sent to the browser for ``fig``."""
+    return len(pio.to_json(fig, validate=False).encode("utf-8"))
+
+
+def _is_typed_array(value) -> bool:
+    """Whether ``value`` is a base64-encoded array (plotly >= 6 ``to_dict``), one value rather than attributes."""
+    return isinstance(value, dict) and ("bdata" in value or "dtype" in value)
+
+
+def _is_attributes(value) -> bool:
+    return isinstance(value, dict) and not _is_typed_array(value)
+
+
+def _equal(a, b) -> bool:
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(np.asarray(a, dtype=object), np.asarray(b, dtype=object))
+    try:
+        return bool(a == b)
+    except ValueError:
+        return False
+
+
+def _strip_static(base: dict, frame_traces: list[dict], top_level: bool) -> None:
+    """Remove keys whose value is the same in ``base`` and every frame trace."""
+    for key, value in base.items():
+        if top_level and key in _KEEP:
+            continue
+        frame_values = [trace.get(key, _MISSING) for trace in frame_traces]
+        if any(frame_value is _MISSING for frame_value in frame_values):
+            continue
+        if _is_attributes(value) and all(_is_attributes(v) for v in frame_values):
+            _strip_static(value, frame_values, top_level=False)
+            for trace in frame_traces:
+                if not trace[key]:
+                    del trace[key]
+        elif all(_equal(value, frame_value) for frame_value in frame_values):
+            for trace in frame_traces:
+                del trace[key]
+
+
+def share_static_attributes(fig_dict: dict) -> None:
+    """Drop attributes from ``fig_dict['frames']`` that never change, in place."""
+    frames = fig_dict.get("frames") or []
+    for index, trace in enumerate(fig_dict.get("data", [])):
+        frame_traces = [
+            frame["data"][index]
+            for frame in frames
+            if index < len(frame.get("data", [])) and frame["data"][index].get("name") == trace.get("name")
+        ]
+        # Only traces present at the same position in every frame are safe to slim
+        if len(frame_traces) != len(frames):
+            continue
+        _strip_static(trace, frame_traces, top_level=True)
+
+
+def decimate_frames(fig_dict: dict, every: int, keep_last: bool = True) -> None:
+    """Keep every ``every``-th frame (and the last one), and their slider steps, in place."""
+    frames = fig_dict.get("frames") or []
+    if every <= 1 or not frames:
+        return
+    last = len(frames) - 1
+    kept = [frame for i, frame in enumerate(frames) if i % every == 0 or (keep_last and i == last)]
+    names = {frame.get("name") for frame in kept}
+    fig_dict["frames"] = kept
+    for slider in fig_dict.get("layout", {}).get("sliders", []):
+        slider["steps"] = [step for step in slider.get("steps", []) if step["args"][0][0] in names]
+
+
+def optimize_animation(fig: go.Figure, name: str, every: int = 1, keep_last: bool = True) -> go.Figure:
+    """Return ``fig`` with decimated, slimmed frames and record its payload size under ``name``."""
+    fig_dict = fig.to_dict()
+    frames_before = len(fig_dict.get("frames") or [])
+    bytes_before = payload_size(fig_dict)
+
+    decimate_frames(fig_dict, every, keep_last)
+    share_static_attributes(fig_dict)
+
+    report = PayloadReport(
+        frames_before=frames_before,
+        frames_after=len(fig_dict.get("frames") or []),
+        bytes_before=bytes_before,
+        bytes_after=payload_size(fig_dict),
+    )
+    _reports[name] = report
+    logger.info(
+        "Animation %s: %d -> %d frames, %.0f -> %.0f kB",
+        name, report.frames_before, report.frames_after,
+        report.bytes_before / 1024, report.bytes_after / 1024,
+    )
+    return go.Figure(fig_dict, _validate=False)
+
+
+def payload_reports() -> dict[str, PayloadReport]:
+    """Frame counts and payload sizes before and after optimization, per chart."""
+    return dict(_reports)
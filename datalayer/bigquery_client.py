@@ -0,0 +1,104 @@
+"""Process-wide BigQuery client shared by every page and loader.
+
+The service account credentials and the ``bigquery.Client`` are created once per
+server process with ``st.cache_resource``, so reruns, pages and concurrent
+sessions reuse the same token and the same pooled HTTP session instead of
+paying token exchange and connection setup on every widget interaction.
+"""
+from __future__ import annotations
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Hashable, Mapping, TypeVar
+
+import pandas as pd
+import streamlit as st
+from google.auth.transport.requests import AuthorizedSession
+from google.cloud import bigquery
+from google.oauth2 import service_account
+from requests.adapters import HTTPAdapter
+
+SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+K = TypeVar("K", bound=Hashable)
+
+# Connections kept open towards the BigQuery API, shared by all sessions
+POOL_SIZE = 32
+
+
+@st.cache_resource
+def get_client() -> bigquery.Client:
+    """Return the BigQuery client for this process, creating it on first use."""
+    credentials = service_account.Credentials.from_service_account_info(
+        st.secrets["gcp_service_account"],
+        scopes=SCOPES,
+    )
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+    session.mount("https://", adapter)
+    return bigquery.Client(
+        project=credentials.project_id,
+        credentials=credentials,
+        _http=session,
+    )
+
+
+def _query_parameter(name: str, value: Any) -> bigquery.ScalarQueryParameter | bigquery.ArrayQueryParameter:
+    """Build a named query parameter, inferring the BigQuery type from the value."""
+    if isinstance(value, (list, tuple, set)):
+        values = list(value)
+        type_ = _parameter_type(values[0]) if values else "STRING"
+        return bigquery.ArrayQueryParameter(name, type_, values)
+    return bigquery.ScalarQueryParameter(name, _parameter_type(value), value)
+
+
+def _parameter_type(value: Any) -> str:
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, datetime.datetime):
+        return "TIMESTAMP"
+    if isinstance(value, datetime.date):
+        return "DATE"
+    return "STRING"
+
+
+def _job_config(params: Mapping[str, Any] | None) -> bigquery.QueryJobConfig | None:
+    if not params:
+        return None
+    return bigquery.QueryJobConfig(
+        query_parameters=[_query_parameter(name, value) for name, value in params.items()]
+    )
+
+
+def run_query(sql: str, params: Mapping[str, Any] | None = None) -> pd.DataFrame:
+    """Run ``sql`` on the shared client and return the result as a DataFrame.
+
+    ``params`` are passed as named query parameters, referenced as ``@name``
+    in the SQL text.
+    """
+    return get_client().query(sql, job_config=_job_config(params)).to_dataframe()
+
+
+def run_queries(
+    queries: Mapping[K, str],
+    params: Mapping[K, Mapping[str, Any]] | None = None,
+) -> dict[K, pd.DataFrame]:
+    """Run independent queries concurrently and return their results by key.
+
+    All jobs are submitted before any result is awaited, so BigQuery executes
+    them in parallel; the result downloads then run on a thread pool. The page
+    waits for the slowest query instead of the sum of all of them.
+    """
+    if not queries:
+        return {}
+    params = params or {}
+    client = get_client()
+    jobs = {key: client.query(sql, job_config=_job_config(params.get(key))) for key, sql in queries.items()}
+
+    with ThreadPoolExecutor(max_workers=min(len(jobs), POOL_SIZE)) as executor:
+        futures = {key: executor.submit(job.to_dataframe) for key, job in jobs.items()}
+        return {key: future.result() for key, future in futures.items()}
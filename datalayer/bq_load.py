@@ -0,0 +1,281 @@
+"""Batch load jobs for the update_bigQuery loaders.
+
+Rows are staged as an in-memory Parquet file and sent with a single load job
+instead of ``client.insert_rows``. Streaming inserts are rate-limited, billed
+per row, sit in the streaming buffer for a while and append again on every
+run; a load job is free, atomic, and with ``WRITE_TRUNCATE`` replaces the table
+(or, for partitioned tables, a single partition) so a refresh can be rerun
+safely. ``merge_rows`` upserts on a natural key through a staging table, for
+incremental refreshes that only fetch new or revised years, and ``load_csv``
+streams large uploaded CSV files through a temporary Parquet file.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import tempfile
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Iterable, Sequence
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from datalayer.bigquery_client import get_client
+from datalayer.query_cache import cached_query
+from datalayer.table_layouts import apply_layout_to_job
+
+logger = logging.getLogger(__name__)
+
+# Markers for missing values in uploaded CSV files
+NA_VALUES = ("", "-")
+
+# Bytes of CSV parsed per block; memory use stays around a few blocks
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+
+_ARROW_TYPES = {
+    "STRING": pa.string(),
+    "INTEGER": pa.int64(),
+    "INT64": pa.int64(),
+    "FLOAT": pa.float64(),
+    "FLOAT64": pa.float64(),
+    "BOOLEAN": pa.bool_(),
+    "BOOL": pa.bool_(),
+    "DATE": pa.date32(),
+    "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+}
+
+
+def arrow_schema(schema: Sequence[bigquery.SchemaField]) -> pa.Schema:
+    return pa.schema([pa.field(field.name, _ARROW_TYPES[field.field_type]) for field in schema])
+
+
+def rows_to_arrow(rows: Iterable[Sequence], schema: Sequence[bigquery.SchemaField]) -> pa.Table:
+    """Column-wise Arrow table from row tuples ordered like ``schema``."""
+    columns = list(zip(*rows)) or [()] * len(schema)
+    target = arrow_schema(schema)
+    return pa.Table.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, target)],
+        schema=target,
+    )
+
+
+def _exists(table_id: str) -> bool:
+    try:
+        get_client().get_table(table_id)
+    except NotFound:
+        return False
+    return True
+
+
+def _load_parquet(
+    file,
+    destination: str,
+    schema: Sequence[bigquery.SchemaField],
+    write_disposition: str,
+) -> bigquery.LoadJob:
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        schema=list(schema),
+        write_disposition=write_disposition,
+    )
+    client = get_client()
+    # A load creating its table lays it out; existing tables keep their partitioning and are migrated separately
+    if "$" not in destination and not _exists(destination):
+        apply_layout_to_job(job_config, destination)
+    job = client.load_table_from_file(file, destination, job_config=job_config)
+    job.result()
+    return job
+
+
+def load_arrow(
+    table_id: str,
+    table: pa.Table,
+    schema: Sequence[bigquery.SchemaField],
+    write_disposition: str = bigquery.WriteDisposition.WRITE_TRUNCATE,
+    partition: str | None = None,
+) -> bigquery.LoadJob:
+    """Load ``table`` into ``table_id`` with one Parquet load job and wait for it.
+
+    ``partition`` (e.g. ``"2023"`` for a yearly range partition) restricts a
+    ``WRITE_TRUNCATE`` to that partition of a partitioned table.
+    """
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer)
+    size = buffer.tell()
+    buffer.seek(0)
+
+    destination = f"{table_id}${partition}" if partition else table_id
+    job = _load_parquet(buffer, destination, schema, write_disposition)
+    logger.info("Loaded %d rows into %s (%.0f kB Parquet)", job.output_rows, destination, size / 1024)
+    return job
+
+
+def csv_to_parquet(
+    source: BinaryIO,
+    destination: str | Path,
+    schema: Sequence[bigquery.SchemaField],
+    header: bool = True,
+    na_values: Sequence[str] = NA_VALUES,
+    delimiter: str = ",",
+    block_size: int = CSV_BLOCK_SIZE,
+) -> int:
+    """Stream a CSV file into a Parquet file typed by ``schema``, one block at a time.
+
+    Columns are taken in ``schema`` order. Every value must convert to its
+    declared type; ``na_values`` become nulls. Raises ``pyarrow.ArrowInvalid``
+    naming the offending column and value otherwise. Returns the row count.
+    """
+    target = arrow_schema(schema)
+    reader = pacsv.open_csv(
+        source,
+        read_options=pacsv.ReadOptions(column_names=target.names, skip_rows=1 if header else 0, block_size=block_size),
+        parse_options=pacsv.ParseOptions(delimiter=delimiter),
+        convert_options=pacsv.ConvertOptions(
+            column_types=target,
+            null_values=list(na_values),
+            strings_can_be_null=True,
+        ),
+    )
+    rows = 0
+    with pq.ParquetWriter(destination, target) as writer:
+        for batch in reader:
+            writer.write_table(pa.Table.from_batches([batch], schema=target))
+            rows += batch.num_rows
+    return rows
+
+
+def load_csv(
+    table_id: str,
+    source: BinaryIO,
+    schema: Sequence[bigquery.SchemaField],
+    write_disposition: str = bigquery.WriteDisposition.WRITE_TRUNCATE,
+    **csv_options,
+) -> bigquery.LoadJob:
+    """Load a CSV file of any size with bounded memory, as one Parquet load job.
+
+    The file is converted block by block into a temporary Parquet file (see
+    ``csv_to_parquet`` for ``csv_options``), which is then uploaded.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "upload.parquet"
+        rows = csv_to_parquet(source, path, schema, **csv_options)
+        with open(path, "rb") as f:
+            job = _load_parquet(f, table_id, schema, write_disposition)
+        logger.info("Loaded %d CSV rows into %s (%.0f kB Parquet)", rows, table_id, path.stat().st_size / 1024)
+    return job
+
+
+def load_rows(
+    table_id: str,
+    rows: Iterable[Sequence],
+    schema: Sequence[bigquery.SchemaField],
+    write_disposition: str = bigquery.WriteDisposition.WRITE_TRUNCATE,
+    partition: str | None = None,
+) -> bigquery.LoadJob:
+    """Load row tuples ordered like ``schema``; see ``load_arrow``."""
+    return load_arrow(table_id, rows_to_arrow(rows, schema), schema, write_disposition, partition)
+
+
+def _qualified(table_id: str) -> str:
+    """``project.dataset.table`` for ids given as ``dataset.table``."""
+    return table_id if table_id.count(".") == 2 else f"{get_client().project}.{table_id}"
+
+
+def merge_sql(target: str, staging: str, columns: Sequence[str], keys: Sequence[str]) -> str:
+    """MERGE that updates changed rows and inserts new ones, matched on ``keys``."""
+    values = [column for column in columns if column not in keys]
+    on = " AND ".join(f"T.`{key}` = S.`{key}`" for key in keys)
+    changed = " OR ".join(f"T.`{column}` IS DISTINCT FROM S.`{column}`" for column in values)
+    column_list = ", ".join(f"`{column}`" for column in columns)
+    lines = [f"MERGE `{target}` T", f"USING `{staging}` S", f"ON {on}"]
+    if values:
+        lines.append(
+            f"WHEN MATCHED AND ({changed}) THEN UPDATE SET "
+            + ", ".join(f"`{column}` = S.`{column}`" for column in values)
+        )
+    lines.append(f"WHEN NOT MATCHED THEN INSERT ({column_list}) VALUES ({', '.join(f'S.`{column}`' for column in columns)})")
+    return "\n".join(lines)
+
+
+def schema_mismatches(
+    target: Sequence[bigquery.SchemaField],
+    schema: Sequence[bigquery.SchemaField],
+) -> list[str]:
+    """Columns of ``schema`` missing from ``target`` or typed differently, as ``name: TYPE != TYPE``."""
+    target_types = {field.name: field.field_type for field in target}
+    mismatched = []
+    for field in schema:
+        target_type = target_types.get(field.name)
+        if target_type is None:
+            mismatched.append(f"{field.name}: missing")
+        elif _ARROW_TYPES.get(target_type) != _ARROW_TYPES[field.field_type]:
+            mismatched.append(f"{field.name}: {target_type} != {field.field_type}")
+    return mismatched
+
+
+def merge_arrow(
+    table_id: str,
+    table: pa.Table,
+    schema: Sequence[bigquery.SchemaField],
+    keys: Sequence[str],
+) -> bigquery.QueryJob | bigquery.LoadJob:
+    """Upsert ``table`` into ``table_id`` on the natural key ``keys``.
+
+    The rows are loaded into a staging table next to the target and merged in
+    one statement, so rerunning the same refresh leaves the table unchanged
+    instead of appending duplicates. The staging table is dropped afterwards,
+    also when its load fails.
+
+    A target that does not exist yet is created by a plain load instead, and
+    that load job is returned. Raises ``ValueError`` before loading anything if the target's columns are
+    typed differently from ``schema``, e.g. the STRING year column of a table
+    that has not been migrated yet (see ``datalayer.table_layouts``).
+    """
+    target = _qualified(table_id)
+    client = get_client()
+    try:
+        existing = client.get_table(target)
+    except NotFound:
+        return load_arrow(target, table, schema)
+    mismatched = schema_mismatches(existing.schema, schema)
+    if mismatched:
+        raise ValueError(
+            f"Cannot merge into {target}, column types differ ({', '.join(mismatched)}); "
+            f"run `python -m datalayer.table_layouts migrate {existing.dataset_id}.{existing.table_id}` first"
+        )
+    # One staging table per run, concurrent refreshes of the same table do not share it
+    staging = f"{target}_staging_{uuid.uuid4().hex}"
+    try:
+        load_arrow(staging, table, schema)
+        job = client.query(merge_sql(target, staging, [field.name for field in schema], keys))
+        job.result()
+    finally:
+        client.delete_table(staging, not_found_ok=True)
+    logger.info("Merged %d rows into %s (%s affected)", table.num_rows, target, job.num_dml_affected_rows)
+    return job
+
+
+def merge_rows(
+    table_id: str,
+    rows: Iterable[Sequence],
+    schema: Sequence[bigquery.SchemaField],
+    keys: Sequence[str],
+) -> bigquery.QueryJob | bigquery.LoadJob:
+    """Upsert row tuples ordered like ``schema``; see ``merge_arrow``."""
+    return merge_arrow(table_id, rows_to_arrow(rows, schema), schema, keys)
+
+
+def existing_values(table_id: str, column: str) -> set:
+    """Distinct values of ``column`` already loaded into ``table_id``.
+
+    Cached until the table's TTL runs out or a load invalidates it, see
+    ``datalayer.query_cache``.
+    """
+    if not _exists(table_id):
+        return set()
+    sql = f"SELECT DISTINCT `{column}` AS value FROM `{_qualified(table_id)}`"
+    return set(cached_query(sql)["value"].dropna())
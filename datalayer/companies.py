@@ -0,0 +1,294 @@
+"""Precomputed rollups of the DnB company data behind pages 8 and 9.
+
+``company_cube`` builds a ``CompanyCube`` once per version of the
+``dnb_data.dnb_ab_falkenberg`` snapshot: sums, counts, per-employee ratios and
+growth per year x bransch_grov x bransch_fin and the coarser levels derived
+from it, the companies of each year, and the top-N companies per year and
+sector. Every widget change on the pages is then a lookup in these small
+frames instead of another groupby or ``nlargest`` over all companies.
+
+Rankings come from a ``RankingIndex``: the companies of every year and of
+every (year, sector) pre-sorted by each ranked metric, so a top-N of any size
+is a slice and the rank of one company a binary search.
+
+``CompanyHistory`` holds every company's yearly figures as contiguous column
+slices keyed on org_nummer, with a prefix index over the company names, so
+finding a company and reading its whole history are lookups.
+"""
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from datalayer.growth import cumulative_growth, year_over_year
+from datalayer.snapshots import data_version, read_snapshot, refresh_snapshots
+
+SNAPSHOT = 'dnb_data.dnb_ab_falkenberg'
+
+YEAR = 'bokslutsar'
+SECTOR = 'bransch_grov'
+SUBSECTOR = 'bransch_fin'
+SUMS = ['omsattning', 'anstallda', 'totalt_kapital', 'eget_kapital', 'resultat']
+RANKED = ['omsattning', 'anstallda', 'resultat', 'totalt_kapital', 'soliditet']
+COMPANY = 'org_nummer'
+NAME = 'foretag'
+HISTORY = ['omsattning', 'anstallda', 'arbetstallen', 'resultat', 'rorelsemarginal',
+           'totalt_kapital', 'eget_kapital', 'soliditet']
+
+TOP_N = 10
+# Page 8's sector growth runs from this year and leaves out companies without a known sector
+GROWTH_SINCE = 2010
+UNKNOWN_SECTOR = 'Okänd'
+# Left out of the per-employee comparison, their balance sheets dwarf the other sectors
+PER_EMPLOYEE_EXCLUDED = [UNKNOWN_SECTOR, 'Finans och fastighetsverksamhet']
+
+
+def _per_employee(frame: pd.DataFrame) -> pd.DataFrame:
+    anstallda = frame['anstallda'].where(frame['anstallda'] != 0)
+    for column in ('omsattning', 'totalt_kapital', 'eget_kapital'):
+        frame[f'{column}_per_anstalld'] = frame[column] / anstallda
+    return frame
+
+
+def _rollup(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    grouped = df.groupby(keys, observed=True, dropna=False)
+    frame = grouped[SUMS].sum()
+    frame['antal_bolag'] = grouped.size()
+    return _per_employee(frame.reset_index())
+
+
+@dataclass
+class _Ranking:
+    # Row positions, largest value first, and the negated values in the same (ascending) order
+    rows: np.ndarray
+    keys: np.ndarray
+
+
+class RankingIndex:
+    """Companies pre-sorted by each metric within every year and every (year, sector).
+
+    Companies without a value for a metric are not ranked on it. Ties keep the
+    table's order, like ``DataFrame.nlargest``.
+    """
+
+    def __init__(self, companies: pd.DataFrame, metrics: list[str] = RANKED):
+        if not companies.index.equals(pd.RangeIndex(len(companies))):
+            companies = companies.reset_index(drop=True)
+        self.companies = companies
+        self._rankings: dict[tuple, _Ranking] = {}
+        for metric in metrics:
+            values = companies[metric].to_numpy(dtype=float)
+            ranked = companies[companies[metric].notna()]
+            self._add(ranked, values, metric, [YEAR])
+            self._add(ranked, values, metric, [YEAR, SECTOR])
+        # (year, org_nummer) -> row position
+        self._positions = {
+            (year, company): position
+            for position, (year, company) in enumerate(zip(companies[YEAR], companies[COMPANY]))
+        }
+
+    def _add(self, ranked: pd.DataFrame, values: np.ndarray, metric: str, keys: list[str]) -> None:
+        ordered = ranked.sort_values(keys + [metric], ascending=[True] * len(keys) + [False], kind='stable')
+        labels = ordered.index.to_numpy()
+        for key, positions in ordered.groupby(keys, observed=True, sort=False).indices.items():
+            # A single key comes back as a 1-tuple in recent pandas
+            key = key if isinstance(key, tuple) else (key,)
+            if len(key) == 1:
+                key = key + (None,)
+            rows = labels[positions]
+            self._rankings[(metric,) + key] = _Ranking(rows, -values[rows])
+
+    def _ranking(self, metric: str, year: int, sector: str | None) -> _Ranking | None:
+        return self._rankings.get((metric, year, sector))
+
+    def top(self, metric: str, year: int, sector: str | None = None, n: int = TOP_N) -> pd.DataFrame:
+        """The ``n`` companies with the largest ``metric`` in ``year``, within ``sector`` when given."""
+        ranking = self._ranking(metric, year, sector)
+        rows = ranking.rows[:n] if ranking is not None else []
+        return self.companies.iloc[rows]
+
+    def count(self, metric: str, year: int, sector: str | None = None) -> int:
+        ranking = self._ranking(metric, year, sector)
+        return 0 if ranking is None else len(ranking.rows)
+
+    def rank(self, company: str, metric: str, year: int, sector: str | None = None) -> int | None:
+        """1-based rank of ``company`` (an org_nummer) by ``metric``, ties sharing the best rank.
+
+        None if the company has no value for ``metric`` in ``year`` or is not in ``sector``.
+        """
+        position = self._positions.get((year, company))
+        ranking = self._ranking(metric, year, sector)
+        if position is None or ranking is None:
+            return None
+        if sector is not None and self.companies[SECTOR].iat[position] != sector:
+            return None
+        value = self.companies[metric].iat[position]
+        if pd.isna(value):
+            return None
+        return int(np.searchsorted(ranking.keys, -float(value), side='left')) + 1
+
+
+def _normalize(name: str) -> str:
+    return ' '.join(re.findall(r'\w+', name.casefold()))
+
+
+class CompanyHistory:
+    """Yearly figures per company, stored column-wise and sliced by org_nummer.
+
+    The rows are sorted by (org_nummer, bokslutsar) once, so one company's
+    history is a contiguous slice of every column. ``search`` matches the
+    start of any word in a company's most recent name through a sorted index.
+    """
+
+    def __init__(self, companies: pd.DataFrame, metrics: list[str] = HISTORY):
+        ordered = companies[companies[COMPANY].notna()].sort_values([COMPANY, YEAR], kind='stable')
+        self.metrics = [metric for metric in metrics if metric in ordered.columns]
+        self._years = ordered[YEAR].to_numpy()
+        self._columns = {metric: ordered[metric].to_numpy() for metric in self.metrics}
+        self._sectors = ordered[SECTOR].to_numpy()
+
+        keys = ordered[COMPANY].to_numpy()
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=int)
+        ends = np.r_[starts[1:], len(keys)]
+        self._slices = {key: (start, end) for key, start, end in zip(keys[starts], starts, ends)}
+
+        # Most recent name of each company, and (normalized word suffix, org_nummer) sorted for prefix search
+        names = ordered[NAME].to_numpy()
+        self.names = {key: str(names[end - 1]) for key, (start, end) in self._slices.items()}
+        entries = set()
+        for key, name in self.names.items():
+            words = _normalize(name).split()
+            for i in range(len(words)):
+                entries.add((' '.join(words[i:]), key))
+        self._index = sorted(entries)
+        self._index_keys = [text for text, _ in self._index]
+
+    def __len__(self) -> int:
+        return len(self._slices)
+
+    def __contains__(self, company: str) -> bool:
+        return company in self._slices
+
+    def search(self, query: str, limit: int = 20) -> list[str]:
+        """org_nummer of up to ``limit`` companies with a name word starting with ``query``.
+
+        Ordered alphabetically from the matching word on.
+        """
+        prefix = _normalize(query)
+        if not prefix:
+            return []
+        found: dict[str, None] = {}
+        start = bisect.bisect_left(self._index_keys, prefix)
+        for text, key in self._index[start:]:
+            if not text.startswith(prefix):
+                break
+            found[key] = None
+            if len(found) == limit:
+                break
+        return list(found)
+
+    def history(self, company: str) -> pd.DataFrame:
+        """One row per bokslutsar of ``company``, oldest first; empty if it is unknown."""
+        start, end = self._slices.get(company, (0, 0))
+        return pd.DataFrame({
+            YEAR: self._years[start:end],
+            SECTOR: self._sectors[start:end],
+            **{metric: values[start:end] for metric, values in self._columns.items()},
+        })
+
+
+@dataclass(frozen=True)
+class CompanyCube:
+    version: str
+    companies: pd.DataFrame
+    # One row per year x bransch_grov x bransch_fin, and the coarser levels summed from it
+    rollup: pd.DataFrame
+    sectors: pd.DataFrame
+    years: pd.DataFrame
+    # Per year and sector since GROWTH_SINCE, with year-over-year and cumulative growth
+    sector_growth: pd.DataFrame
+    # Per year and sector, without PER_EMPLOYEE_EXCLUDED and the latest year's companies without employees
+    per_employee: pd.DataFrame
+    rankings: RankingIndex = field(repr=False)
+    history: CompanyHistory = field(repr=False)
+    rows_by_year: dict = field(repr=False)
+
+    def year_list(self) -> list[int]:
+        return self.years[YEAR].tolist()
+
+    def sector_list(self) -> list[str]:
+        return self.companies[SECTOR].drop_duplicates().tolist()
+
+    def companies_in(self, year: int) -> pd.DataFrame:
+        """The companies of ``year``, e.g. for the sunburst charts."""
+        return self.companies.loc[self.rows_by_year.get(year, [])]
+
+    def sector_year(self, year: int, sector: str) -> pd.Series:
+        """Sums and counts of ``sector`` in ``year``; zeros if it has no companies then."""
+        rows = self.sectors[(self.sectors[YEAR] == year) & (self.sectors[SECTOR] == sector)]
+        if rows.empty:
+            return pd.Series(0, index=SUMS + ['antal_bolag'])
+        return rows.iloc[0]
+
+    def year_total(self, year: int) -> pd.Series:
+        return self.years[self.years[YEAR] == year].iloc[0]
+
+    def top(self, metric: str, year: int, sector: str | None = None, n: int = TOP_N) -> pd.DataFrame:
+        """The ``n`` companies by ``metric`` in ``year``, within ``sector`` when given."""
+        return self.rankings.top(metric, year, sector, n)
+
+
+def build_cube(df: pd.DataFrame, version: str = '') -> CompanyCube:
+    df = df.reset_index(drop=True)
+    rollup = _rollup(df, [YEAR, SECTOR, SUBSECTOR])
+    branch = rollup[SECTOR].astype(str) + ' / ' + rollup[SUBSECTOR].astype(str)
+    rollup['growth_rate'] = year_over_year(rollup.assign(branch=branch), YEAR, 'branch', 'omsattning')
+
+    counts = SUMS + ['antal_bolag']
+    sectors = _per_employee(rollup.groupby([YEAR, SECTOR], as_index=False, dropna=False)[counts].sum())
+    years = _per_employee(rollup.groupby(YEAR, as_index=False)[counts].sum())
+    years['growth_rate'] = years['omsattning'].pct_change() * 100
+
+    sector_growth = sectors[
+        sectors[SECTOR].notna() & (sectors[SECTOR] != UNKNOWN_SECTOR) & (sectors[YEAR] >= GROWTH_SINCE)
+    ].copy()
+    sector_growth['growth_rate'] = year_over_year(sector_growth, YEAR, SECTOR, 'omsattning')
+    sector_growth['cumulative_growth'] = cumulative_growth(sector_growth, YEAR, SECTOR, 'omsattning') * 100
+
+    included = df[df[SECTOR].notna() & ~df[SECTOR].isin(PER_EMPLOYEE_EXCLUDED)]
+    latest = included[YEAR].max()
+    included = included[~((included[YEAR] == latest) & (included['anstallda'] == 0))]
+    per_employee = _rollup(included, [SECTOR, YEAR])
+
+    return CompanyCube(
+        version=version,
+        companies=df,
+        rollup=rollup,
+        sectors=sectors,
+        years=years,
+        sector_growth=sector_growth.reset_index(drop=True),
+        per_employee=per_employee,
+        rankings=RankingIndex(df),
+        history=CompanyHistory(df),
+        rows_by_year={year: rows.to_numpy() for year, rows in df.groupby(YEAR, observed=True).groups.items()},
+    )
+
+
+_lock = threading.Lock()
+_cube: CompanyCube | None = None
+
+
+def company_cube() -> CompanyCube:
+    """The cube of the current DnB snapshot, rebuilt only when the snapshot changes."""
+    global _cube
+    refresh_snapshots([SNAPSHOT])
+    version = data_version(SNAPSHOT)
+    with _lock:
+        if _cube is None or _cube.version != version:
+            _cube = build_cube(read_snapshot(SNAPSHOT), data_version(SNAPSHOT))
+        return _cube
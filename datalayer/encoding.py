@@ -0,0 +1,53 @@
+"""Compact column types for the frames the data layer hands to the pages.
+
+BigQuery and Parquet give years and codes back as Python string objects. Every
+snapshot and aggregate frame is passed through ``encode`` once when it is
+loaded: year columns become small integers, so they sort, compare and filter
+numerically, and code columns become categoricals, so each distinct code is
+stored once and groupbys, merges and filters work on integer category codes.
+
+Labels are attached per category rather than per row: ``with_labels`` maps the
+few distinct codes of a categorical to their names from a dimension table
+(``datalayer.snapshots.code_labels``) or ``KON_LABELS``.
+"""
+from __future__ import annotations
+
+from typing import Mapping
+
+import pandas as pd
+
+YEAR_COLUMNS = ("ar", "bokslutsar")
+CODE_COLUMNS = ("regso", "kommun", "kon")
+
+KON_LABELS = {"1": "man", "2": "kvinna"}
+
+
+def _year(column: pd.Series) -> pd.Series:
+    years = pd.to_numeric(column, errors="coerce")
+    if years.isna().any():
+        return years.astype("Int16")
+    return years.astype("int16")
+
+
+def encode(frame: pd.DataFrame) -> pd.DataFrame:
+    """``frame`` with integer year columns and categorical code columns, converted in place."""
+    for name in YEAR_COLUMNS:
+        if name in frame.columns and not pd.api.types.is_integer_dtype(frame[name]):
+            frame[name] = _year(frame[name])
+    for name in CODE_COLUMNS:
+        # pandas >= 3 reads strings as the "str" dtype rather than object
+        if name in frame.columns and (frame[name].dtype == object or pd.api.types.is_string_dtype(frame[name])):
+            frame[name] = frame[name].astype("category")
+    return frame
+
+
+def with_labels(codes: pd.Series, labels: Mapping[str, str]) -> pd.Series:
+    """Names of ``codes`` from ``labels``, looked up once per distinct code.
+
+    Codes without a label keep their code; distinct codes need distinct labels.
+    """
+    if not isinstance(codes.dtype, pd.CategoricalDtype):
+        codes = codes.astype("category")
+    return codes.cat.rename_categories(
+        {code: labels.get(code, code) for code in codes.cat.categories}
+    )
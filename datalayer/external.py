@@ -0,0 +1,72 @@
+"""External PxWeb requests made directly by the pages.
+
+Kept here rather than inline in the pages so the warm-up (``datalayer.warmup``)
+can prefetch exactly the responses the pages will ask for.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any
+
+from datalayer.http_cache import cached_post_json
+
+
+@dataclass(frozen=True)
+class ExternalRequest:
+    url: str
+    payload: dict
+    headers: dict = field(default_factory=dict)
+
+    def fetch(self) -> Any:
+        """The decoded response, from the response cache when still valid."""
+        return cached_post_json(self.url, self.payload, headers=self.headers)
+
+
+BRANSLEN = ["905", "910", "915", "920", "925", "930", "14", "16"]
+
+# Page 10: grid-connected solar power, Sweden, Halland and three municipalities
+SOLCELLER = ExternalRequest(
+    url="http://pxexternal.energimyndigheten.se/api/v1/sv/Nätanslutna solcellsanläggningar/EN0123_2.px",
+    payload={
+        "query": [
+            {"code": "Område", "selection": {"filter": "item", "values": ["0", "11", "151", "153", "154"]}},
+        ],
+        "response": {"format": "json"},
+    },
+    headers={"Content-Type": "application/json"},
+)
+
+# Page 11: final energy use in Falkenberg per consumer category and fuel, 2021
+SLUTANVANDNING_KATEGORI = ExternalRequest(
+    url="https://api.scb.se/OV0104/v1/doris/sv/ssd/START/EN/EN0203/EN0203A/SlutAnvSektor",
+    payload={
+        "query": [
+            {"code": "Region", "selection": {"filter": "item", "values": ["1382"]}},
+            {
+                "code": "Forbrukningskategri",
+                "selection": {"filter": "item", "values": ["911", "921", "931", "941", "951", "98", "97", "964"]},
+            },
+            {"code": "Bransle", "selection": {"filter": "item", "values": BRANSLEN}},
+            {"code": "Tid", "selection": {"filter": "item", "values": ["2021"]}},
+        ],
+        "response": {"format": "json"},
+    },
+)
+
+# Page 12: final energy use in Falkenberg per fuel, all years
+SLUTANVANDNING_BRANSLE = ExternalRequest(
+    url="https://api.scb.se/OV0104/v1/doris/sv/ssd/START/EN/EN0203/EN0203A/SlutAnvSektor",
+    payload={
+        "query": [
+            {"code": "Region", "selection": {"filter": "item", "values": ["1382"]}},
+            {"code": "Bransle", "selection": {"filter": "item", "values": BRANSLEN}},
+        ],
+        "response": {"format": "json"},
+    },
+)
+
+EXTERNAL_REQUESTS = {
+    "energimyndigheten.solceller": SOLCELLER,
+    "scb.slutanvandning_kategori": SLUTANVANDNING_KATEGORI,
+    "scb.slutanvandning_bransle": SLUTANVANDNING_BRANSLE,
+}
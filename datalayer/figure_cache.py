@@ -0,0 +1,133 @@
+"""Server-side cache of built Plotly figures.
+
+Building the animated ``plotly.express`` charts (one frame per year, every
+municipality per frame) dominates CPU time on the app server. ``cached_figure``
+keeps the serialized figure JSON keyed on the chart name, the version of the
+data it was built from and its parameters, so a repeated view skips
+``plotly.express`` and its property validation entirely.
+
+Serialization is not saved. Streamlit only accepts figure objects, so a hit
+still parses the stored JSON and wraps it in a ``go.Figure`` (without
+validation, which the figure already passed when it was built), and
+``st.plotly_chart`` serializes that figure to JSON again on every render.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Mapping
+
+import plotly.graph_objects as go
+import plotly.io as pio
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the serialized figures held in memory, in bytes
+MAX_BYTES = 128 * 1024 * 1024
+
+
+@dataclass
+class FigureStats:
+    """Timings for one chart, in seconds, plus hit/miss counts."""
+
+    build: float = 0.0
+    serialize: float = 0.0
+    load: float = 0.0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+
+
+_lock = threading.Lock()
+_figures: OrderedDict[str, str] = OrderedDict()
+_bytes = 0
+_stats: dict[str, FigureStats] = {}
+
+
+def figure_key(name: str, data_version: str, params: Mapping[str, Any] | None = None) -> str:
+    payload = json.dumps([name, data_version, params or {}], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _store(key: str, figure_json: str) -> None:
+    global _bytes
+    size = len(figure_json)
+    if size > MAX_BYTES:
+        return
+    with _lock:
+        if key in _figures:
+            _bytes -= len(_figures.pop(key))
+        _figures[key] = figure_json
+        _bytes += size
+        while _bytes > MAX_BYTES:
+            _, evicted = _figures.popitem(last=False)
+            _bytes -= len(evicted)
+
+
+def cached_figure_json(
+    name: str,
+    data_version: str,
+    build: Callable[[], go.Figure],
+    params: Mapping[str, Any] | None = None,
+) -> str:
+    """Return the serialized figure for ``name``, calling ``build`` only on a miss."""
+    key = figure_key(name, data_version, params)
+    stats = _stats.setdefault(name, FigureStats())
+    with _lock:
+        figure_json = _figures.get(key)
+        if figure_json is not None:
+            _figures.move_to_end(key)
+            stats.hits += 1
+            return figure_json
+
+    start = time.perf_counter()
+    fig = build()
+    built = time.perf_counter()
+    figure_json = pio.to_json(fig, validate=False)
+    serialized = time.perf_counter()
+
+    stats.misses += 1
+    stats.build = built - start
+    stats.serialize = serialized - built
+    stats.size = len(figure_json)
+    logger.info(
+        "Built figure %s in %.0f ms, serialized in %.0f ms (%.0f kB)",
+        name, stats.build * 1000, stats.serialize * 1000, stats.size / 1024,
+    )
+    _store(key, figure_json)
+    return figure_json
+
+
+def cached_figure(
+    name: str,
+    data_version: str,
+    build: Callable[[], go.Figure],
+    params: Mapping[str, Any] | None = None,
+) -> go.Figure:
+    """Return the figure for ``name``, rebuilt only when its data or params change.
+
+    ``build`` takes no arguments and returns the figure; anything it depends on
+    besides the data identified by ``data_version`` must be passed in ``params``.
+    """
+    figure_json = cached_figure_json(name, data_version, build, params)
+    start = time.perf_counter()
+    fig = go.Figure(json.loads(figure_json), _validate=False)
+    _stats[name].load = time.perf_counter() - start
+    return fig
+
+
+def figure_stats() -> dict[str, FigureStats]:
+    """Per-chart build, serialize and load timings of the most recent build/hit."""
+    return dict(_stats)
+
+
+def clear() -> None:
+    global _bytes
+    with _lock:
+        _figures.clear()
+        _bytes = 0
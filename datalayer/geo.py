@@ -0,0 +1,149 @@
+"""Simplified, quantized regso geometries for the choropleth maps.
+
+The source GeoJSON files keep the full survey precision (15 decimals, a vertex
+every few meters), far more than a map at municipality or county zoom can show,
+and all of it is shipped to the browser with every render. ``load_regso_geojson``
+simplifies the polygons as one coverage, so neighbouring regsos keep a common
+border, with a tolerance derived from the most detailed zoom level the map
+should stay sharp at, rounds coordinates to the matching number of decimals, drops the feature properties (the maps only match on ``feature.id``)
+and caches the result on disk and in memory.
+
+Source files live in ``pages/geodata`` and must carry the regso code as each
+feature's ``id``, like ``regso_falkenberg.geojson`` does.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import threading
+from pathlib import Path
+from typing import Iterable
+
+import shapely
+from shapely.geometry import mapping, shape
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parents[1]
+GEODATA_DIR = ROOT / "pages" / "geodata"
+CACHE_DIR = ROOT / ".cache" / "geo"
+
+REGSO_FILES = {
+    "falkenberg": GEODATA_DIR / "regso_falkenberg.geojson",
+}
+
+# Most detailed zoom each area's map is drawn at, the pages and the warm-up share it
+REGSO_ZOOM = {
+    "falkenberg": 11,
+}
+
+# Web mercator tiles are 256 px wide and cover 360 degrees at zoom 0
+_DEGREES_PER_PIXEL_Z0 = 360 / 256
+
+_lock = threading.Lock()
+_memo: dict[tuple, dict] = {}
+
+
+def tolerance_for_zoom(zoom: float) -> float:
+    """Simplification tolerance in degrees: half a screen pixel at ``zoom``."""
+    return _DEGREES_PER_PIXEL_Z0 / 2 ** zoom / 2
+
+
+def precision_for_zoom(zoom: float) -> int:
+    """Coordinate decimals needed to stay below a tenth of a pixel at ``zoom``."""
+    return max(0, math.ceil(-math.log10(_DEGREES_PER_PIXEL_Z0 / 2 ** zoom / 10)))
+
+
+def _quantize(coordinates, precision: int):
+    """Round nested coordinate lists and drop points that collapse onto their predecessor."""
+    if coordinates and isinstance(coordinates[0], (int, float)):
+        return [round(c, precision) for c in coordinates]
+    rounded = [_quantize(c, precision) for c in coordinates]
+    if rounded and isinstance(rounded[0][0], (int, float)):
+        deduplicated = [rounded[0]]
+        for point in rounded[1:]:
+            if point != deduplicated[-1]:
+                deduplicated.append(point)
+        return deduplicated
+    return rounded
+
+
+def simplify_geojson(
+    geojson: dict,
+    zoom: float,
+    keep_properties: Iterable[str] = (),
+) -> dict:
+    """Return a copy of ``geojson`` simplified and quantized for maps up to ``zoom``."""
+    tolerance = tolerance_for_zoom(zoom)
+    precision = precision_for_zoom(zoom)
+    keep_properties = set(keep_properties)
+
+    # Simplified as one coverage: a border shared by two regsos is simplified once, so no gaps or overlaps open up
+    geometries = shapely.coverage_simplify(
+        [shape(feature["geometry"]) for feature in geojson["features"]], tolerance
+    )
+    # Snapping to the grid through GEOS keeps rings valid where plain rounding could make them cross
+    geometries = shapely.set_precision(geometries, 10 ** -precision)
+
+    features = []
+    for feature, geometry in zip(geojson["features"], geometries):
+        geometry = mapping(geometry)
+        simplified = {
+            "type": "Feature",
+            "id": feature.get("id"),
+            "properties": {
+                key: value for key, value in feature.get("properties", {}).items() if key in keep_properties
+            },
+            "geometry": {
+                "type": geometry["type"],
+                "coordinates": _quantize(json.loads(json.dumps(geometry["coordinates"])), precision),
+            },
+        }
+        features.append(simplified)
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _source_fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return hashlib.sha1(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:12]
+
+
+def load_regso_geojson(area: str, zoom: float | None = None, keep_properties: Iterable[str] = ()) -> dict:
+    """Simplified regso geometries for ``area`` (see ``REGSO_FILES``), cached per source version.
+
+    ``zoom`` defaults to the area's ``REGSO_ZOOM``.
+    """
+    path = REGSO_FILES[area]
+    zoom = REGSO_ZOOM[area] if zoom is None else zoom
+    keep_properties = tuple(sorted(keep_properties))
+    fingerprint = _source_fingerprint(path)
+    key = (area, zoom, keep_properties, fingerprint)
+
+    geojson = _memo.get(key)
+    if geojson is not None:
+        return geojson
+
+    with _lock:
+        geojson = _memo.get(key)
+        if geojson is not None:
+            return geojson
+        suffix = "-".join(keep_properties) or "noprops"
+        cache_file = CACHE_DIR / f"{path.stem}_coverage_z{zoom:g}_{suffix}_{fingerprint}.geojson"
+        if cache_file.exists():
+            with open(cache_file) as f:
+                geojson = json.load(f)
+        else:
+            with open(path) as f:
+                source = json.load(f)
+            geojson = simplify_geojson(source, zoom, keep_properties)
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump(geojson, f, separators=(",", ":"))
+            logger.info(
+                "Simplified %s for zoom %g: %.0f kB -> %.0f kB",
+                path.name, zoom, path.stat().st_size / 1024, cache_file.stat().st_size / 1024,
+            )
+        _memo[key] = geojson
+    return geojson
@@ -0,0 +1,60 @@
+"""Vectorized growth metrics for yearly series split into groups.
+
+All functions take a long frame with one row per (time, group) and return a
+Series aligned with the frame's index. The frame is pivoted once into a
+time x group matrix and the metric is computed with whole-array operations, so
+the cost grows with the number of cells rather than with years x groups x rows.
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+
+def _wide(df: pd.DataFrame, time: str, group: str, value: str) -> pd.DataFrame:
+    wide = df.pivot_table(index=time, columns=group, values=value, aggfunc='sum', observed=True)
+    # Years may arrive as strings; order them numerically
+    return wide.sort_index(key=lambda index: pd.to_numeric(index))
+
+
+def _to_rows(wide: pd.DataFrame, df: pd.DataFrame, time: str, group: str) -> pd.Series:
+    """Look up each row's (time, group) cell in ``wide``."""
+    row_idx = wide.index.get_indexer(df[time])
+    col_idx = wide.columns.get_indexer(df[group])
+    return pd.Series(wide.to_numpy()[row_idx, col_idx], index=df.index)
+
+
+def cagr_to_reference(
+    df: pd.DataFrame,
+    time: str,
+    group: str,
+    value: str,
+    reference=None,
+) -> pd.Series:
+    """Compound annual growth rate from each row's year to ``reference`` (default: latest year).
+
+    Rows in the reference year get 0. Groups missing in the reference year get NaN.
+    """
+    wide = _wide(df, time, group, value)
+    years = pd.to_numeric(wide.index).to_numpy(dtype=float)
+    reference_year = years.max() if reference is None else float(reference)
+    end_values = wide.to_numpy()[years == reference_year][0]
+
+    years_diff = (reference_year - years)[:, np.newaxis]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = (end_values[np.newaxis, :] / wide.to_numpy()) ** (1 / years_diff) - 1
+    cagr[years == reference_year] = 0.0
+    return _to_rows(pd.DataFrame(cagr, index=wide.index, columns=wide.columns), df, time, group)
+
+
+def year_over_year(df: pd.DataFrame, time: str, group: str, value: str) -> pd.Series:
+    """Growth relative to the previous year within each group, as a fraction."""
+    wide = _wide(df, time, group, value)
+    return _to_rows(wide / wide.shift(1) - 1, df, time, group)
+
+
+def cumulative_growth(df: pd.DataFrame, time: str, group: str, value: str) -> pd.Series:
+    """Growth since each group's first year with data, as a fraction."""
+    wide = _wide(df, time, group, value)
+    base = wide.bfill().iloc[0]
+    return _to_rows(wide / base - 1, df, time, group)
@@ -0,0 +1,153 @@
+"""Disk-backed cache for PxWeb API responses used directly by the pages.
+
+Pages 10-12 query SCB and Energimyndigheten live. Their tables are updated a
+few times a year, so ``cached_post_json`` keeps each response on disk under
+``.cache/http`` keyed on URL and payload. Within ``ttl`` a cached response is
+served as is; after that it is revalidated against the table's ``updated``
+timestamp from the parent folder listing (one small GET) and only refetched
+when the table has changed. If the API cannot be reached, the last cached
+response is served instead of failing the page, without contacting the API
+again for ``RETRY_AFTER`` seconds.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Mapping
+
+import requests
+
+from datalayer import http_client
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache" / "http"
+
+# Serve cached responses without contacting the API for this long, in seconds
+DEFAULT_TTL = 6 * 60 * 60
+
+# After a failed refresh, serve the cached response without retrying for this long, in seconds
+RETRY_AFTER = 5 * 60
+
+_lock = threading.Lock()
+_key_locks: dict[str, threading.Lock] = {}
+# key -> (entry without body, response text); callers always get a fresh parse
+_memo: dict[str, tuple[dict, str]] = {}
+
+
+def request_key(url: str, payload: Any) -> str:
+    raw = json.dumps([url, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _key_lock(key: str) -> threading.Lock:
+    with _lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _paths(key: str) -> tuple[Path, Path]:
+    return CACHE_DIR / f"{key}.meta.json", CACHE_DIR / f"{key}.json"
+
+
+def _read(key: str) -> tuple[dict, str] | None:
+    cached = _memo.get(key)
+    if cached is not None:
+        return cached
+    meta_path, body_path = _paths(key)
+    try:
+        entry = json.loads(meta_path.read_text())
+        text = body_path.read_text(encoding="utf-8")
+    except (OSError, ValueError):
+        return None
+    _memo[key] = (entry, text)
+    return entry, text
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _write(key: str, entry: dict, text: str | None = None) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    meta_path, body_path = _paths(key)
+    if text is not None:
+        _write_atomic(body_path, text)
+    else:
+        text = _memo[key][1]
+    _write_atomic(meta_path, json.dumps(entry))
+    _memo[key] = (entry, text)
+
+
+def _fresh(entry: dict, ttl: float) -> bool:
+    now = time.time()
+    return now - entry["fetched_at"] < ttl or now < entry.get("retry_at", 0)
+
+
+def table_updated(url: str) -> str | None:
+    """The ``updated`` timestamp of the PxWeb table at ``url``, from its folder listing."""
+    folder, table_id = url.rstrip("/").rsplit("/", 1)
+    # A cheap check, do not hold up the page retrying it
+    for item in http_client.get_json(folder, retries=0):
+        if item.get("id") == table_id:
+            return item.get("updated")
+    return None
+
+
+def cached_post_json(
+    url: str,
+    payload: Any,
+    ttl: float = DEFAULT_TTL,
+    headers: Mapping[str, str] | None = None,
+) -> Any:
+    """POST ``payload`` as JSON to ``url`` and return the decoded response, cached on disk."""
+    key = request_key(url, payload)
+    cached = _read(key)
+    if cached is not None and _fresh(cached[0], ttl):
+        return json.loads(cached[1])
+
+    with _key_lock(key):
+        # Another session may have refreshed it while we waited for the lock
+        cached = _read(key)
+        if cached is not None and _fresh(cached[0], ttl):
+            return json.loads(cached[1])
+
+        try:
+            updated = table_updated(url)
+        except (requests.RequestException, ValueError):
+            logger.warning("Could not read the update time of %s", url, exc_info=True)
+            updated = None
+
+        if cached is not None and updated is not None and cached[0].get("updated") == updated:
+            # Unchanged upstream, restart the TTL without downloading the data again
+            _write(key, {**cached[0], "fetched_at": time.time()})
+            return json.loads(cached[1])
+
+        try:
+            text = http_client.request("POST", url, json=payload, headers=dict(headers or {})).text
+            json.loads(text)
+        except (requests.RequestException, ValueError):
+            if cached is None:
+                raise
+            logger.exception("Could not refresh %s, serving the cached response for %d s", url, RETRY_AFTER)
+            # Later reruns serve the stale copy at once instead of waiting for the retries again
+            _write(key, {**cached[0], "retry_at": time.time() + RETRY_AFTER})
+            return json.loads(cached[1])
+
+        _write(key, {"url": url, "fetched_at": time.time(), "updated": updated}, text)
+        return json.loads(text)
+
+
+def clear() -> None:
+    with _lock:
+        _memo.clear()
+    for path in CACHE_DIR.glob("*.json"):
+        path.unlink(missing_ok=True)
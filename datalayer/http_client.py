@@ -0,0 +1,158 @@
+"""Shared HTTP session for the external APIs (SCB and Energimyndigheten PxWeb).
+
+One keep-alive connection pool per process, explicit connect and read
+timeouts so a slow endpoint cannot block a Streamlit script thread forever,
+bounded retries with exponential backoff and jitter on throttling, server and
+network errors (honouring ``Retry-After``), gzip-compressed responses, and
+latency statistics per endpoint.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = 16
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 60
+
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Latency samples kept per endpoint for the percentiles
+SAMPLES = 200
+
+
+class RateLimiter(Protocol):
+    def acquire(self) -> None: ...
+
+
+@dataclass
+class EndpointStats:
+    """Request counts and latencies for one endpoint, in seconds."""
+
+    requests: int = 0
+    errors: int = 0
+    retries: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    recent: deque = field(default_factory=lambda: deque(maxlen=SAMPLES), repr=False)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.requests if self.requests else 0.0
+
+    @property
+    def p95(self) -> float:
+        if len(self.recent) < 2:
+            return self.max
+        return statistics.quantiles(self.recent, n=20)[-1]
+
+
+_lock = threading.Lock()
+_session: requests.Session | None = None
+_stats: dict[str, EndpointStats] = {}
+
+
+def get_session() -> requests.Session:
+    """The process-wide session, created on first use."""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = "gzip, deflate"
+            _session = session
+        return _session
+
+
+def endpoint(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+
+def _record(url: str, seconds: float, error: bool = False, retry: bool = False) -> None:
+    with _lock:
+        stats = _stats.setdefault(endpoint(url), EndpointStats())
+        stats.requests += 1
+        stats.errors += error
+        stats.retries += retry
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        stats.recent.append(seconds)
+
+
+def _delay(attempt: int, retry_after: str | None) -> float:
+    if retry_after and retry_after.isdigit():
+        return float(retry_after) + random.uniform(0, BACKOFF)
+    # Full jitter: anywhere between 0 and the exponential backoff
+    return random.uniform(0, BACKOFF * 2 ** (attempt + 1))
+
+
+def request(
+    method: str,
+    url: str,
+    *,
+    timeout: float | tuple[float, float] | None = None,
+    retries: int = RETRIES,
+    rate_limiter: RateLimiter | None = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """Send a request on the shared session, retrying transient failures.
+
+    ``rate_limiter.acquire()`` is called before every attempt. Raises
+    ``requests.HTTPError`` for error responses once the retries are used up.
+    """
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    session = get_session()
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            _record(url, time.perf_counter() - start, error=True, retry=attempt < retries)
+            if attempt == retries:
+                raise
+            retry_after = None
+        else:
+            failed = response.status_code in RETRY_STATUS
+            _record(url, time.perf_counter() - start, error=response.status_code >= 400,
+                    retry=failed and attempt < retries)
+            if not failed or attempt == retries:
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get("Retry-After")
+        delay = _delay(attempt, retry_after)
+        logger.warning("%s %s failed (attempt %d), retrying in %.1f s", method, endpoint(url), attempt + 1, delay)
+        time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def get_json(url: str, **kwargs: Any) -> Any:
+    return request("GET", url, **kwargs).json()
+
+
+def post_json(url: str, payload: Any, **kwargs: Any) -> Any:
+    return request("POST", url, json=payload, **kwargs).json()
+
+
+def endpoint_stats() -> dict[str, EndpointStats]:
+    """Latency statistics per endpoint since the process started."""
+    with _lock:
+        return dict(_stats)
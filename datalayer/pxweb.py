@@ -0,0 +1,310 @@
+"""Declarative ingestion of SCB PxWeb tables into BigQuery.
+
+A table is described once by a ``PxTable``: its PxWeb URL, the selection to
+request, and which PxWeb variable or content value fills each BigQuery
+column. ``ingest`` fetches it, parses the response into typed Arrow columns in
+one pass (with SCB's missing-value markers such as ``".."`` as nulls) and
+loads or merges it with ``datalayer.bq_load``. The configured tables live in
+``datalayer.pxweb_tables``; ``update_bigQuery/pxweb_loader.py`` is the
+Streamlit front end.
+
+SCB caps the number of cells per request and the number of requests per time
+window. ``fetch`` reads the table metadata, splits the selection into chunks
+below the cell limit, fetches them concurrently through a shared token bucket
+on the pooled session from ``datalayer.http_client`` (which retries with
+backoff), and stitches the responses back together.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Sequence
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from google.cloud import bigquery
+
+from datalayer import http_client
+from datalayer.bigquery_client import get_client
+from datalayer.bq_load import arrow_schema, existing_values, load_arrow, merge_arrow
+from datalayer.query_cache import invalidate_tables
+from datalayer.table_layouts import apply_layout
+
+logger = logging.getLogger(__name__)
+
+# SCB revises the most recent published years, refetch this many of them
+REVISE_LATEST = 1
+
+# Cell values SCB uses for data that is missing, confidential or not applicable
+MISSING = ("..", ".", "-")
+
+# SCB's limits: cells per request, and requests per rolling window of seconds
+MAX_CELLS = 150_000
+MAX_REQUESTS = 30
+WINDOW = 10
+
+MAX_WORKERS = 4
+RETRIES = 5
+
+
+@dataclass(frozen=True)
+class Column:
+    """A BigQuery column filled from PxWeb variable ``variable`` or content value ``value``."""
+
+    name: str
+    type: str
+    variable: str | None = None
+    value: int | None = None
+
+
+@dataclass(frozen=True)
+class PxTable:
+    dataset: str
+    table: str
+    url: str
+    # PxWeb query items, without the response format
+    query: Sequence[dict]
+    columns: Sequence[Column]
+    # Natural key of a row, incremental refreshes are merged on it
+    keys: Sequence[str]
+    # Optional row predicate on the parsed Arrow table; rows where it is false or null are dropped
+    where: Callable[[pa.Table], pa.Array] | None = None
+    time_variable: str = "Tid"
+    time_column: str = "ar"
+    description: str = ""
+
+    @property
+    def table_id(self) -> str:
+        return f"{self.dataset}.{self.table}"
+
+    @property
+    def schema(self) -> list[bigquery.SchemaField]:
+        return [bigquery.SchemaField(column.name, column.type) for column in self.columns]
+
+
+@dataclass
+class IngestResult:
+    mode: str
+    rows: int
+    years: list[str] | None = None
+
+
+def item_selection(code: str, values: Iterable[str], filter: str = "item") -> dict:
+    """PxWeb query item selecting ``values`` of variable ``code``."""
+    return {"code": code, "selection": {"filter": filter, "values": list(values)}}
+
+
+def time_selection(years: Iterable[str], time_code: str = "Tid") -> dict:
+    return item_selection(time_code, years)
+
+
+class TokenBucket:
+    """Blocking rate limiter allowing ``capacity`` calls per ``period`` seconds."""
+
+    def __init__(self, capacity: int, period: float):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Shared by every request to SCB from this process
+_bucket = TokenBucket(MAX_REQUESTS, WINDOW)
+
+
+def _request(method: str, url: str, **kwargs) -> dict:
+    """Request on the shared HTTP session within SCB's rate limit."""
+    return http_client.request(method, url, rate_limiter=_bucket, retries=RETRIES, **kwargs).json()
+
+
+def table_metadata(url: str) -> dict:
+    """Variables and their values for the PxWeb table at ``url``."""
+    return _request("GET", url)
+
+
+def variable_values(metadata: dict, code: str) -> list[str]:
+    for variable in metadata["variables"]:
+        if variable["code"] == code:
+            return list(variable["values"])
+    raise KeyError(f"PxWeb table has no variable {code!r}")
+
+
+def years_to_refresh(
+    available: Iterable[str],
+    existing: Iterable[str | int],
+    revise_latest: int = REVISE_LATEST,
+) -> list[str]:
+    """Years missing from ``existing``, plus the latest ``revise_latest`` years already loaded.
+
+    ``existing`` may hold the loaded years as integers; PxWeb names them as strings.
+    """
+    available = set(available)
+    existing = {str(year) for year in existing} & available
+    revised = sorted(existing, key=int)[-revise_latest:] if revise_latest else []
+    return sorted((available - existing) | set(revised), key=int)
+
+
+def incremental_years(spec: PxTable, revise_latest: int = REVISE_LATEST) -> list[str]:
+    """Years of ``spec`` that are new or may have been revised since the last load."""
+    available = variable_values(table_metadata(spec.url), spec.time_variable)
+    return years_to_refresh(available, existing_values(spec.table_id, spec.time_column), revise_latest)
+
+
+def _explicit_selection(spec: PxTable, metadata: dict, years: Sequence[str] | None) -> list[dict]:
+    """``spec.query`` with every variable that multiplies the cell count given explicit values.
+
+    Variables left out of the query count once if PxWeb may eliminate them, and
+    with all their values otherwise (the time variable and the contents).
+    """
+    selected = {item["code"]: item for item in spec.query}
+    if years is not None:
+        selected[spec.time_variable] = time_selection(years, spec.time_variable)
+
+    query = []
+    for variable in metadata["variables"]:
+        code = variable["code"]
+        item = selected.get(code)
+        if item is not None and item["selection"]["filter"] == "all":
+            item = item_selection(code, variable["values"])
+        if item is None and not variable.get("elimination", False):
+            item = item_selection(code, variable["values"])
+        if item is not None:
+            query.append(item)
+    return query
+
+
+def cell_count(query: Sequence[dict]) -> int:
+    return math.prod(len(item["selection"]["values"]) for item in query)
+
+
+def chunk_query(query: list[dict], max_cells: int = MAX_CELLS) -> list[list[dict]]:
+    """Split ``query`` along its largest selections into queries of at most ``max_cells`` cells."""
+    cells = cell_count(query)
+    if cells <= max_cells:
+        return [query]
+    # Aggregations over groups (agg:) must stay whole, everything else can be split
+    splittable = [i for i, item in enumerate(query) if not item["selection"]["filter"].startswith("agg:")]
+    index = max(splittable, key=lambda i: len(query[i]["selection"]["values"]))
+    item = query[index]
+    values = item["selection"]["values"]
+    if len(values) == 1:
+        raise ValueError(f"Cannot split PxWeb query of {cells} cells below {max_cells}")
+
+    parts = min(len(values), math.ceil(cells / max_cells))
+    size = math.ceil(len(values) / parts)
+    chunks = []
+    for start in range(0, len(values), size):
+        part = {**item, "selection": {**item["selection"], "values": values[start:start + size]}}
+        chunks.extend(chunk_query(query[:index] + [part] + query[index + 1:], max_cells))
+    return chunks
+
+
+def fetch(spec: PxTable, years: Sequence[str] | None = None, max_cells: int = MAX_CELLS) -> dict:
+    """Fetch the selection of ``spec``, restricted to ``years`` when given.
+
+    The selection is split into requests of at most ``max_cells`` cells, sent
+    concurrently within SCB's rate limit, and the responses are combined into
+    one response-shaped dict.
+    """
+    metadata = table_metadata(spec.url)
+    chunks = chunk_query(_explicit_selection(spec, metadata, years), max_cells)
+    logger.info("Fetching %s in %d request(s)", spec.table_id, len(chunks))
+
+    def post(query: list[dict]) -> dict:
+        return _request("POST", spec.url, json={"query": query, "response": {"format": "json"}})
+
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(chunks))) as executor:
+        responses = list(executor.map(post, chunks))
+
+    combined = dict(responses[0])
+    combined["data"] = [entry for response in responses for entry in response["data"]]
+    return combined
+
+
+def _coerce(raw: np.ndarray, field_type: pa.DataType) -> pa.Array:
+    strings = pa.array(raw, type=pa.string())
+    missing = pc.is_in(strings, value_set=pa.array(MISSING, type=pa.string()))
+    strings = pc.if_else(missing, pa.scalar(None, type=pa.string()), strings)
+    return strings.cast(field_type)
+
+
+def parse(spec: PxTable, data: dict) -> pa.Table:
+    """Turn a PxWeb JSON response into an Arrow table with ``spec``'s columns and types."""
+    variables = [column["code"] for column in data["columns"] if column["type"] != "c"]
+    entries = data["data"]
+    target = arrow_schema(spec.schema)
+    # An incremental window with nothing published yet comes back without rows
+    if not entries:
+        return target.empty_table()
+    keys = np.array([entry["key"] for entry in entries], dtype=object).reshape(len(entries), -1)
+    values = np.array([entry["values"] for entry in entries], dtype=object).reshape(len(entries), -1)
+
+    arrays = []
+    for column, target_field in zip(spec.columns, target):
+        if column.variable is not None:
+            raw = keys[:, variables.index(column.variable)]
+        else:
+            raw = values[:, column.value]
+        arrays.append(_coerce(raw, target_field.type))
+    table = pa.Table.from_arrays(arrays, schema=target)
+
+    if spec.where is not None:
+        table = table.filter(spec.where(table))
+    return table
+
+
+def create_table(spec: PxTable, location: str = "EU") -> None:
+    """Create the dataset and table for ``spec`` if they do not exist yet.
+
+    The table is partitioned and clustered as in ``datalayer.table_layouts``.
+    """
+    client = get_client()
+    dataset = bigquery.Dataset(f"{client.project}.{spec.dataset}")
+    dataset.location = location
+    client.create_dataset(dataset, exists_ok=True)
+    table = apply_layout(bigquery.Table(f"{client.project}.{spec.table_id}", schema=spec.schema))
+    client.create_table(table, exists_ok=True)
+
+
+def ingest(spec: PxTable, incremental: bool = False) -> IngestResult:
+    """Fetch ``spec`` from SCB and load it into BigQuery.
+
+    A full refresh replaces the table with one load job. An incremental refresh
+    fetches only new and revised years and merges them on ``spec.keys``.
+    """
+    if incremental:
+        years = incremental_years(spec)
+        if not years:
+            return IngestResult("merge", 0, [])
+        table = parse(spec, fetch(spec, years))
+        job = merge_arrow(spec.table_id, table, spec.schema, spec.keys)
+        # The first incremental refresh of a table creates it with a load job
+        rows = job.output_rows if isinstance(job, bigquery.LoadJob) else job.num_dml_affected_rows
+        result = IngestResult("merge", rows or 0, years)
+    else:
+        table = parse(spec, fetch(spec))
+        job = load_arrow(spec.table_id, table, spec.schema)
+        result = IngestResult("load", job.output_rows, None)
+
+    # Let the dashboards drop cached results for this table
+    invalidate_tables([spec.table_id])
+    logger.info("Ingested %s: %s of %d rows", spec.table_id, result.mode, result.rows)
+    return result
@@ -0,0 +1,78 @@
+"""SCB PxWeb tables loaded into BigQuery, see ``datalayer.pxweb``.
+
+Adding a dataset means adding a ``PxTable`` to ``TABLES``.
+"""
+from __future__ import annotations
+
+import pyarrow.compute as pc
+
+from datalayer.pxweb import Column, PxTable, item_selection
+
+SCB_API = "https://api.scb.se/OV0104/v1/doris/sv/ssd/START"
+
+# Number of regsos per municipality in Halland (Hylte, Halmstad, Laholm, Falkenberg, Varberg, Kungsbacka)
+HALLAND_REGSO_COUNTS = {"1315": 7, "1380": 28, "1381": 11, "1382": 14, "1383": 17, "1384": 18}
+HALLAND_REGSO = [
+    f"{kommun}R{number:03d}"
+    for kommun, count in HALLAND_REGSO_COUNTS.items()
+    for number in range(1, count + 1)
+]
+
+TABLES = {
+    "scb_befolkning.regso_socio_halland": PxTable(
+        dataset="scb_befolkning",
+        table="regso_socio_halland",
+        url=f"{SCB_API}/AA/AA0003/AA0003F/IntGr5Socio",
+        query=[item_selection("Region", HALLAND_REGSO)],
+        columns=[
+            Column("regso", "STRING", variable="Region"),
+            Column("ar", "INTEGER", variable="Tid"),
+            Column("socio_ek_index", "FLOAT", value=0),
+            Column("socio_ek_nivå", "INTEGER", value=1),
+            Column("andel_forgymnasial_utbildning_20_64_ar", "FLOAT", value=2),
+            Column("andel_lag_ekonomisk_standard", "FLOAT", value=3),
+            Column("andel_ek_bistand_eller_langtidsarbetslos", "FLOAT", value=4),
+        ],
+        keys=["regso", "ar"],
+        description="Socioekonomiskt index och indikatorer per regso",
+    ),
+    "scb_befolkning.regso_kon_inkomst_halland": PxTable(
+        dataset="scb_befolkning",
+        table="regso_kon_inkomst_halland",
+        url=f"{SCB_API}/HE/HE0110/HE0110I/Tab2InkDesoN",
+        query=[
+            item_selection("Region", HALLAND_REGSO, filter="vs:RegSoHE"),
+            item_selection("Inkomstkomponenter", ["240"]),
+            item_selection("Kon", ["1", "2"]),
+            item_selection("ContentsCode", ["000005FW"]),
+        ],
+        columns=[
+            Column("regso", "STRING", variable="Region"),
+            Column("kon", "STRING", variable="Kon"),
+            Column("ar", "INTEGER", variable="Tid"),
+            Column("nettoinkomst_tkr", "FLOAT", value=0),
+        ],
+        keys=["regso", "kon", "ar"],
+        description="Nettoinkomst per regso och kön, tkr",
+    ),
+    "scb_befolkning.regso_transfereringar_halland": PxTable(
+        dataset="scb_befolkning",
+        table="regso_transfereringar_halland",
+        url=f"{SCB_API}/AA/AA0003/AA0003G/IntGr4RegSOKon",
+        query=[
+            item_selection("Region", HALLAND_REGSO),
+            item_selection("Kon", ["1+2"]),
+            item_selection("Bakgrund", ["tot20-64"], filter="vs:IntegrationBakgrundÅlder"),
+            item_selection("ContentsCode", ["000004WR"]),
+        ],
+        columns=[
+            Column("regso", "STRING", variable="Region"),
+            Column("ar", "INTEGER", variable="Tid"),
+            Column("andel_sjuk_och_stod_av_nettoinkomst", "FLOAT", value=0),
+        ],
+        keys=["regso", "ar"],
+        # Missing and zero shares are not published values
+        where=lambda table: pc.greater(table["andel_sjuk_och_stod_av_nettoinkomst"], 0),
+        description="Andel av nettoinkomsten från sjuk- och stödersättningar per regso",
+    ),
+}
@@ -0,0 +1,123 @@
+"""Chart-ready queries that join, filter and derive columns in BigQuery.
+
+Each entry in ``VIEWS`` is materialized as a snapshot (see ``datalayer.snapshots``)
+under its ``view.`` name, so the pages read a few hundred pre-joined rows with
+exactly the columns they plot instead of copying whole tables and merging them
+in pandas.
+"""
+from __future__ import annotations
+
+from datalayer.query_builder import Select, eq
+
+FALKENBERG = eq("r.kommunnamn", "Falkenberg")
+
+
+def integer_years(name: str, column: str = "ar") -> Select:
+    """``name`` with its year column as INT64, whether or not the table is migrated yet.
+
+    Tables still stored with STRING years (see ``datalayer.table_layouts``)
+    would otherwise fail to join on ``ar`` with migrated ones. BigQuery prunes
+    the unused columns of the ``*``, so this reads no more than naming them.
+    """
+    return Select(name, "y").select(f"* REPLACE (SAFE_CAST(y.{column} AS INT64) AS {column})")
+
+
+# dim_regso_deso has one row per DeSO, the pages only need one per regso
+REGSOS = (
+    Select("scb_befolkning.dim_regso_deso", "d")
+    .select("d.regso", "d.regsonamn", "d.kommunnamn")
+    .distinct()
+)
+
+REGSO_FOLKMANGD = (
+    Select(integer_years("scb_befolkning.regso_folkmangd_halland"), "f")
+    .select("f.regso", "f.ar", "SUM(f.folkmangd) AS folkmangd")
+    .group_by("f.regso", "f.ar")
+)
+
+SOCIO_REGSO_FALKENBERG = (
+    Select(integer_years("scb_befolkning.regso_socio_halland"), "s")
+    .select(
+        "s.regso",
+        "s.ar",
+        "s.socio_ek_index",
+        "s.`socio_ek_nivå`",
+        "s.andel_forgymnasial_utbildning_20_64_ar",
+        "s.andel_lag_ekonomisk_standard",
+        "s.andel_ek_bistand_eller_langtidsarbetslos",
+        "100 - s.andel_forgymnasial_utbildning_20_64_ar AS andel_gymnasie_hogre_utbildning_20_64_ar",
+        "r.regsonamn",
+        "f.folkmangd",
+    )
+    .join(REGSOS, "r", on=("regso",))
+    .join(REGSO_FOLKMANGD, "f", on=("regso", "ar"), how="left")
+    .where(FALKENBERG)
+)
+
+# Mean net income of men and women per regso and year, for all of Halland
+INKOMST_REGSO = (
+    Select(integer_years("scb_befolkning.regso_kon_inkomst_halland"), "i")
+    .select(
+        "i.ar",
+        "i.regso",
+        "AVG(i.nettoinkomst_tkr) AS nettoinkomst_tkr",
+        # Page 7 scales its x-axis to the highest regso in the county
+        "MAX(AVG(i.nettoinkomst_tkr)) OVER () AS nettoinkomst_tkr_max_halland",
+    )
+    .group_by("i.ar", "i.regso")
+)
+
+INKOMST_REGSO_FALKENBERG = (
+    Select(INKOMST_REGSO, "i")
+    .select(
+        "i.ar",
+        "i.regso",
+        "r.regsonamn",
+        "i.nettoinkomst_tkr",
+        "i.nettoinkomst_tkr_max_halland",
+        "t.andel_sjuk_och_stod_av_nettoinkomst",
+        "f.folkmangd",
+    )
+    .join(REGSOS, "r", on=("regso",))
+    .join(integer_years("scb_befolkning.regso_transfereringar_halland"), "t", on=("regso", "ar"))
+    .join(REGSO_FOLKMANGD, "f", on=("regso", "ar"))
+    .where(FALKENBERG)
+)
+
+INKOMST_KON_REGSO_FALKENBERG = (
+    Select(integer_years("scb_befolkning.regso_kon_inkomst_halland"), "i")
+    .select(
+        "i.ar",
+        "i.regso",
+        "r.regsonamn",
+        "i.kon",
+        "i.nettoinkomst_tkr",
+    )
+    .join(REGSOS, "r", on=("regso",))
+    .where(FALKENBERG)
+)
+
+# Municipalities at group level (koncern), the regions are left out
+SKULDER_KOMMUNER = (
+    Select(integer_years("scb_budget.kommunala_skulden_investeringar"), "k")
+    .select(
+        "k.ar",
+        "k.kommunkod",
+        "k.kommun_region",
+        "k.lankod",
+        "k.kommungrupp",
+        "k.koncern_T_F",
+        "k.folkmangd",
+        "k.laneskuld",
+        "SAFE_DIVIDE(k.laneskuld, k.folkmangd) AS skuld_per_capita",
+        "SAFE_DIVIDE(k.investeringar, k.folkmangd) AS investeringar_per_capita",
+    )
+    .where(eq("k.region_T_F", 0), eq("k.koncern_T_F", 1))
+)
+
+VIEWS = {
+    "view.socio_regso_falkenberg": SOCIO_REGSO_FALKENBERG.sql(),
+    "view.inkomst_regso_falkenberg": INKOMST_REGSO_FALKENBERG.sql(),
+    "view.inkomst_kon_regso_falkenberg": INKOMST_KON_REGSO_FALKENBERG.sql(),
+    "view.skulder_kommuner": SKULDER_KOMMUNER.sql(),
+}
@@ -0,0 +1,113 @@
+"""A small builder for the SELECT statements the dashboards send to BigQuery.
+
+Queries are composed from immutable ``Select`` objects, so shared pieces (the
+distinct regso dimension, population per regso and year ...) are defined once
+and joined into several queries. The outermost ``Select`` of every query names
+its columns explicitly, so only the columns a chart uses are read and sent
+over the wire. The one ``SELECT *`` is ``datalayer.queries.integer_years``, a
+``SELECT * REPLACE`` subquery that is always wrapped in such a ``Select``;
+BigQuery prunes the columns the outer query does not use.
+
+    regsos = Select("scb_befolkning.dim_regso_deso", "d").select("d.regso", "d.kommunnamn").distinct()
+    query = (
+        Select("scb_befolkning.regso_socio_halland", "s")
+        .select("s.ar", "s.regso", "s.socio_ek_index")
+        .join(regsos, "r", on=("regso",))
+        .where(eq("r.kommunnamn", "Falkenberg"))
+    )
+    query.sql()
+"""
+from __future__ import annotations
+
+import datetime
+from dataclasses import dataclass, replace
+from typing import Any, Union
+
+PROJECT = "falkenbergcloud"
+
+Source = Union[str, "Select"]
+
+
+def table(name: str) -> str:
+    """Fully qualified, quoted reference to ``dataset.table``."""
+    return f"`{PROJECT}.{name}`"
+
+
+def literal(value: Any) -> str:
+    """Render ``value`` as a GoogleSQL literal."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, datetime.date):
+        return f"DATE '{value.isoformat()}'"
+    escaped = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{escaped}'"
+
+
+def eq(column: str, value: Any) -> str:
+    return f"{column} = {literal(value)}"
+
+
+def isin(column: str, values) -> str:
+    return f"{column} IN ({', '.join(literal(value) for value in values)})"
+
+
+def _render_source(source: Source) -> str:
+    if isinstance(source, Select):
+        return f"({source.sql()})"
+    return table(source)
+
+
+@dataclass(frozen=True)
+class Join:
+    source: Source
+    alias: str
+    on: tuple[str, ...]
+    how: str = "INNER"
+
+
+@dataclass(frozen=True)
+class Select:
+    """``SELECT columns FROM source AS alias`` plus joins, filters and grouping."""
+
+    source: Source
+    alias: str
+    columns: tuple[str, ...] = ()
+    joins: tuple[Join, ...] = ()
+    filters: tuple[str, ...] = ()
+    group: tuple[str, ...] = ()
+    is_distinct: bool = False
+
+    def select(self, *columns: str) -> Select:
+        return replace(self, columns=self.columns + columns)
+
+    def join(self, source: Source, alias: str, on: tuple[str, ...], how: str = "INNER") -> Select:
+        """Join ``source`` on the columns named in ``on``, which both sides share."""
+        return replace(self, joins=self.joins + (Join(source, alias, tuple(on), how.upper()),))
+
+    def where(self, *conditions: str) -> Select:
+        return replace(self, filters=self.filters + conditions)
+
+    def group_by(self, *columns: str) -> Select:
+        return replace(self, group=self.group + columns)
+
+    def distinct(self) -> Select:
+        return replace(self, is_distinct=True)
+
+    def sql(self) -> str:
+        if not self.columns:
+            raise ValueError(f"Select from {self.source!r} has no columns")
+        lines = [
+            ("SELECT DISTINCT " if self.is_distinct else "SELECT ") + ", ".join(self.columns),
+            f"FROM {_render_source(self.source)} AS {self.alias}",
+        ]
+        for join in self.joins:
+            lines.append(f"{join.how} JOIN {_render_source(join.source)} AS {join.alias} USING ({', '.join(join.on)})")
+        if self.filters:
+            lines.append("WHERE " + " AND ".join(f"({condition})" for condition in self.filters))
+        if self.group:
+            lines.append("GROUP BY " + ", ".join(self.group))
+        return "\n".join(lines)
@@ -0,0 +1,173 @@
+"""Process-wide cache of BigQuery query results, and its cross-process invalidation.
+
+Results are keyed on the normalized SQL text plus its parameters and kept for
+the TTL of the tables they read (``TABLE_TTL``); the snapshots in
+``datalayer.snapshots`` use the same TTLs as their max age. The cache has a
+memory budget and evicts the least recently used results once it is exceeded.
+
+The update_bigQuery loaders run as separate Streamlit apps, so invalidation goes
+through a small marker file: ``invalidate_tables`` records when a table was
+reloaded, and cached results and snapshots fetched before that moment from a
+query referencing the table are dropped or refreshed on their next lookup.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+import pandas as pd
+
+from datalayer.bigquery_client import run_query
+
+CACHE_DIR = Path(__file__).resolve().parents[1] / ".cache"
+INVALIDATION_FILE = CACHE_DIR / "invalidations.json"
+
+# Used for any table that has no entry in TABLE_TTL, in seconds
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+# The SCB and budget tables are reloaded at most yearly and use DEFAULT_TTL,
+# DnB data is uploaded a few times a year and may be corrected in between
+TABLE_TTL = {
+    "dnb_data.dnb_ab_falkenberg": 24 * 60 * 60,
+}
+
+# Upper bound for the DataFrames held by the cache, in bytes
+MAX_BYTES = 64 * 1024 * 1024
+
+# Matches `project.dataset.table` and `dataset.table` references in FROM/JOIN clauses
+_TABLE_PATTERN = re.compile(r"`(?:[\w-]+\.)?(\w+\.\w+)`")
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapse whitespace so formatting differences map to the same cache key."""
+    return " ".join(sql.split())
+
+
+def referenced_tables(sql: str) -> frozenset[str]:
+    """Return the ``dataset.table`` names referenced in ``sql``."""
+    return frozenset(_TABLE_PATTERN.findall(sql))
+
+
+def cache_key(sql: str, params: Mapping[str, Any] | None = None) -> str:
+    payload = json.dumps(
+        {"sql": normalize_sql(sql), "params": params or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def ttl_for(tables: Iterable[str]) -> float:
+    """Shortest TTL among the tables a query reads from."""
+    return min((TABLE_TTL.get(table, DEFAULT_TTL) for table in tables), default=DEFAULT_TTL)
+
+
+def invalidate_tables(tables: Iterable[str] | None = None) -> None:
+    """Mark ``tables`` (``dataset.table``) as reloaded; ``None`` invalidates everything.
+
+    Called by the update_bigQuery loaders after a successful load. Every
+    process sees the marker on its next cache lookup or snapshot read.
+    """
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    markers = _read_invalidations()
+    now = time.time()
+    for table in (tables if tables is not None else ["*"]):
+        markers[table] = now
+    # Write through a temporary file so readers never see a half-written marker file
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(markers, f)
+    os.replace(tmp_path, INVALIDATION_FILE)
+
+
+def last_invalidated(table: str) -> float:
+    """Time ``table`` was last marked as reloaded, 0 if never."""
+    markers = _read_invalidations()
+    return max(markers.get(table, 0), markers.get("*", 0))
+
+
+def _read_invalidations() -> dict[str, float]:
+    try:
+        with open(INVALIDATION_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+@dataclass
+class _Entry:
+    frame: pd.DataFrame
+    tables: frozenset[str]
+    stored_at: float
+    expires_at: float
+    nbytes: int
+
+
+class QueryCache:
+    """Thread-safe LRU cache of query results bounded by TTL and memory."""
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> pd.DataFrame | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() >= entry.expires_at or any(
+                last_invalidated(table) > entry.stored_at for table in entry.tables
+            ):
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry.frame
+
+    def put(self, key: str, frame: pd.DataFrame, tables: frozenset[str], ttl: float) -> None:
+        nbytes = int(frame.memory_usage(deep=True).sum())
+        if nbytes > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(frame, tables, now, now + ttl, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: str) -> None:
+        self._bytes -= self._entries.pop(key).nbytes
+
+
+# Module level so the cache is shared by every page, session and rerun in the process
+_cache = QueryCache()
+
+
+def cached_query(sql: str, params: Mapping[str, Any] | None = None) -> pd.DataFrame:
+    """Return the result of ``sql``, served from the cache while still fresh.
+
+    Callers get their own copy, so they can add columns or filter in place
+    without touching the cached frame.
+    """
+    key = cache_key(sql, params)
+    frame = _cache.get(key)
+    if frame is None:
+        frame = run_query(sql, params)
+        tables = referenced_tables(sql)
+        _cache.put(key, frame, tables, ttl_for(tables))
+    return frame.copy()
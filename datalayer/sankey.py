@@ -0,0 +1,140 @@
+"""Sankey diagrams from tidy frames.
+
+``sankey_flows`` takes one row per leaf (e.g. cost per verksamhetsområde, or
+energy per fuel and consumer category) and the columns that make up the flow
+from left to right. Node labels are factorized once per level and the links
+between consecutive levels are summed with ``np.bincount`` on the paired node
+codes, so building a diagram costs a few array operations however many rows
+there are.
+
+Labels whose flow is below ``min_value`` are folded into one "Övriga" node
+per level. ``sankey_flows_by`` builds one diagram per value of a column (per
+year, say) on a shared node list, so the nodes keep their positions and
+colours when switching between years.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Hashable, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+OTHER_LABEL = 'Övriga'
+
+
+@dataclass(frozen=True)
+class SankeyFlows:
+    labels: list[str]
+    source: np.ndarray
+    target: np.ndarray
+    value: np.ndarray
+
+    def trace(self, **kwargs) -> go.Sankey:
+        """A ``go.Sankey`` of the flows; ``node`` and other keyword arguments are passed on."""
+        node = {'label': self.labels, **kwargs.pop('node', {})}
+        link = {'source': self.source, 'target': self.target, 'value': self.value, **kwargs.pop('link', {})}
+        return go.Sankey(node=node, link=link, **kwargs)
+
+
+def _fold_small(
+    labels: pd.Series,
+    values: np.ndarray,
+    groups: pd.Series | None,
+    min_value: float,
+    other_label: str,
+) -> pd.Series:
+    """``labels`` with those whose total (per group, at most) is below ``min_value`` replaced."""
+    frame = pd.DataFrame({'label': labels.to_numpy(), 'value': values})
+    if groups is None:
+        totals = frame.groupby('label')['value'].sum()
+    else:
+        frame['group'] = groups.to_numpy()
+        totals = frame.groupby(['group', 'label'])['value'].sum().groupby(level='label').max()
+    small = totals.index[totals < min_value]
+    return labels.where(~labels.isin(small), other_label)
+
+
+def _node_codes(
+    frame: pd.DataFrame,
+    levels: Sequence[str],
+    values: np.ndarray,
+    root: str | None,
+    min_value: float,
+    other_label: str,
+    by: str | None,
+) -> tuple[list[str], list[np.ndarray]]:
+    """Node labels and, per level (the root first, if any), every row's node index."""
+    labels: list[str] = []
+    codes: list[np.ndarray] = []
+    if root is not None:
+        labels.append(root)
+        codes.append(np.zeros(len(frame), dtype=np.int64))
+    for level in levels:
+        column = frame[level].astype(object).where(frame[level].notna(), '').astype(str)
+        if min_value > 0:
+            column = _fold_small(column, values, frame[by] if by else None, min_value, other_label)
+        # One node per label and level, the same text on two levels is two nodes
+        level_codes, uniques = pd.factorize(column)
+        codes.append(level_codes.astype(np.int64) + len(labels))
+        labels.extend(uniques.tolist())
+    return labels, codes
+
+
+def _links(codes: list[np.ndarray], values: np.ndarray, n_nodes: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    sources, targets, sums = [], [], []
+    for source, target in zip(codes[:-1], codes[1:]):
+        pairs, inverse = np.unique(source * n_nodes + target, return_inverse=True)
+        sums.append(np.bincount(inverse, weights=values, minlength=len(pairs)))
+        sources.append(pairs // n_nodes)
+        targets.append(pairs % n_nodes)
+    if not sources:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, np.array([], dtype=float)
+    source, target, value = np.concatenate(sources), np.concatenate(targets), np.concatenate(sums)
+    keep = value > 0
+    return source[keep], target[keep], value[keep]
+
+
+def _values(frame: pd.DataFrame, value: str) -> np.ndarray:
+    # Missing values (SCB's "..") and negative amounts carry no flow
+    return pd.to_numeric(frame[value], errors='coerce').fillna(0).clip(lower=0).to_numpy(dtype=float)
+
+
+def sankey_flows(
+    frame: pd.DataFrame,
+    levels: Sequence[str],
+    value: str,
+    root: str | None = None,
+    min_value: float = 0.0,
+    other_label: str = OTHER_LABEL,
+) -> SankeyFlows:
+    """Flows from ``root`` (a single node linked to every first-level node, if given)
+    through the columns ``levels`` of ``frame``, sized by column ``value``.
+    """
+    values = _values(frame, value)
+    labels, codes = _node_codes(frame, levels, values, root, min_value, other_label, None)
+    return SankeyFlows(labels, *_links(codes, values, len(labels)))
+
+
+def sankey_flows_by(
+    frame: pd.DataFrame,
+    by: str,
+    levels: Sequence[str],
+    value: str,
+    root: str | None = None,
+    min_value: float = 0.0,
+    other_label: str = OTHER_LABEL,
+) -> dict[Hashable, SankeyFlows]:
+    """``sankey_flows`` per value of column ``by``, all sharing one node list.
+
+    A label is folded into ``other_label`` only if it stays below ``min_value`` in every group.
+    """
+    values = _values(frame, value)
+    labels, codes = _node_codes(frame, levels, values, root, min_value, other_label, by)
+    flows = {}
+    for key, positions in frame.groupby(by, observed=True, sort=True).indices.items():
+        group_codes = [level_codes[positions] for level_codes in codes]
+        flows[key] = SankeyFlows(labels, *_links(group_codes, values[positions], len(labels)))
+    return flows
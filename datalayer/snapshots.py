@@ -0,0 +1,355 @@
+"""Local Parquet snapshots of the analytical BigQuery tables.
+
+Every table the dashboards read is small and changes at most a few times a year,
+so it is materialized into ``snapshots/<name>.parquet`` together with an entry
+in ``snapshots/manifest.json`` (row count, schema hash, fetch time). Pages read
+the memory-mapped Parquet file and only go to BigQuery when the snapshot is
+missing, older than the TTL of its source tables (``datalayer.query_cache``),
+or older than the last load of one of them.
+
+Refresh all snapshots from the command line with::
+
+    python -m datalayer.snapshots sync
+    python -m datalayer.snapshots status
+
+Set ``SNAPSHOT_OFFLINE=1`` to serve whatever snapshots exist without ever
+contacting BigQuery, e.g. when developing without credentials.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from datalayer.bigquery_client import run_queries, run_query
+from datalayer.encoding import encode
+from datalayer.queries import VIEWS
+from datalayer.query_cache import last_invalidated, referenced_tables, ttl_for
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get("SNAPSHOT_DIR", Path(__file__).resolve().parents[1] / "snapshots"))
+MANIFEST_FILE = SNAPSHOT_DIR / "manifest.json"
+
+# Serve existing snapshots only, never fall back to BigQuery
+OFFLINE = os.environ.get("SNAPSHOT_OFFLINE", "") not in ("", "0")
+
+# Upper bound for the decoded DataFrames kept in memory, in bytes
+MAX_BYTES = 256 * 1024 * 1024
+
+# Snapshot name -> query that materializes it. Small tables are copied whole;
+# the national population tables are restricted to what the dashboards show.
+# Years are INT64 whether or not the table has been migrated to its layout yet.
+SNAPSHOTS = {
+    "scb_befolkning.dim_regso_deso": "SELECT * FROM `falkenbergcloud.scb_befolkning.dim_regso_deso`",
+    "scb_befolkning.folkmangd_falkenberg": """
+        SELECT alder, SAFE_CAST(ar AS INT64) AS ar, SUM(folkmangd) AS folkmangd
+        FROM `falkenbergcloud.scb_befolkning.folkmangd`
+        WHERE kommun = '1382'
+        GROUP BY alder, 2
+    """,
+    "scb_befolkning.folkmangd_prognos_falkenberg": """
+        SELECT alder, SAFE_CAST(ar AS INT64) AS ar, SUM(folkmangd) AS folkmangd
+        FROM `falkenbergcloud.scb_befolkning.folkmangd_prognos`
+        WHERE kommun = '1382'
+        GROUP BY alder, 2
+    """,
+    "scb_befolkning.regso_folkmangd": "SELECT * REPLACE (SAFE_CAST(ar AS INT64) AS ar) FROM `falkenbergcloud.scb_befolkning.regso_folkmangd`",
+    "scb_befolkning.regso_folkmangd_halland": "SELECT * REPLACE (SAFE_CAST(ar AS INT64) AS ar) FROM `falkenbergcloud.scb_befolkning.regso_folkmangd_halland`",
+    "scb_budget.kommun_kostnader": "SELECT * REPLACE (SAFE_CAST(ar AS INT64) AS ar) FROM `falkenbergcloud.scb_budget.kommun_kostnader`",
+    "scb_budget.dim_verksamhetsomrade_kommun": "SELECT * FROM `falkenbergcloud.scb_budget.dim_verksamhetsomrade_kommun`",
+    "dnb_data.dnb_ab_falkenberg": "SELECT * REPLACE (SAFE_CAST(bokslutsar AS INT64) AS bokslutsar) FROM `falkenbergcloud.dnb_data.dnb_ab_falkenberg`",
+    # Joined, filtered and pruned in BigQuery, see datalayer.queries
+    **VIEWS,
+}
+
+_lock = threading.Lock()
+_name_locks: dict[str, threading.Lock] = {}
+# (name, fetched_at, columns) -> (DataFrame, bytes), least recently used first, so reruns
+# skip the Arrow -> pandas conversion
+_frames: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+_frames_bytes = 0
+
+
+def snapshot_path(name: str) -> Path:
+    return SNAPSHOT_DIR / f"{name}.parquet"
+
+
+def read_manifest() -> dict[str, dict]:
+    try:
+        with open(MANIFEST_FILE) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_manifest(manifest: dict[str, dict]) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, MANIFEST_FILE)
+
+
+def schema_hash(schema: pa.Schema) -> str:
+    """Short hash of column names and types, to spot schema changes between syncs."""
+    fields = [(field.name, str(field.type)) for field in schema]
+    return hashlib.sha1(json.dumps(fields).encode("utf-8")).hexdigest()[:16]
+
+
+def _name_lock(name: str) -> threading.Lock:
+    with _lock:
+        return _name_locks.setdefault(name, threading.Lock())
+
+
+def write_snapshot(name: str, frame: pd.DataFrame, **extra) -> dict:
+    """Write ``frame`` as snapshot ``name`` and record it in the manifest.
+
+    ``extra`` is stored alongside the standard manifest fields.
+    """
+    SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+
+    path = snapshot_path(name)
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, suffix=".parquet.tmp")
+    os.close(fd)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+    entry = {
+        "file": path.name,
+        "row_count": table.num_rows,
+        "schema_hash": schema_hash(table.schema),
+        "fetched_at": time.time(),
+        **extra,
+    }
+    with _lock:
+        manifest = read_manifest()
+        previous = manifest.get(name)
+        if previous and previous["schema_hash"] != entry["schema_hash"]:
+            logger.warning("Schema of snapshot %s changed since last sync", name)
+        manifest[name] = entry
+        _write_manifest(manifest)
+    return entry
+
+
+def sync_snapshot(name: str) -> dict:
+    """Fetch ``name`` from BigQuery, write its Parquet file and update the manifest."""
+    return write_snapshot(name, run_query(SNAPSHOTS[name]))
+
+
+def sync_snapshots(names: Iterable[str] | None = None) -> dict[str, dict]:
+    """Refresh the given snapshots, or all of them, with concurrent BigQuery jobs."""
+    names = list(names or SNAPSHOTS)
+    frames = run_queries({name: SNAPSHOTS[name] for name in names})
+    return {name: write_snapshot(name, frames[name]) for name in names}
+
+
+def refresh_snapshots(names: Iterable[str], max_age: float | None = None) -> list[str]:
+    """Refresh every stale snapshot among ``names`` with concurrent BigQuery jobs.
+
+    Pages call this with everything they are about to read, so a cold start
+    waits for the slowest table instead of the sum of all of them. Failures are
+    logged and left to ``read_snapshot``, which serves a stale copy or raises.
+    Returns the names that were refreshed.
+    """
+    if OFFLINE:
+        return []
+    manifest = read_manifest()
+    stale = sorted({name for name in names if is_stale(name, manifest.get(name), max_age)})
+    if not stale:
+        return []
+
+    # Sorted acquisition order, so concurrent sessions cannot deadlock
+    locks = [_name_lock(name) for name in stale]
+    for lock in locks:
+        lock.acquire()
+    try:
+        manifest = read_manifest()
+        stale = [name for name in stale if is_stale(name, manifest.get(name), max_age)]
+        try:
+            frames = run_queries({name: SNAPSHOTS[name] for name in stale})
+        except Exception:
+            logger.exception("Could not refresh snapshots %s", ", ".join(stale))
+            _postpone(stale)
+            return []
+        for name, frame in frames.items():
+            write_snapshot(name, frame)
+    finally:
+        for lock in reversed(locks):
+            lock.release()
+    return stale
+
+
+def max_age_for(name: str) -> float:
+    """Seconds until snapshot ``name`` is refreshed: the TTL of the tables it reads, see ``datalayer.query_cache``."""
+    return ttl_for(referenced_tables(SNAPSHOTS[name]))
+
+
+def _postpone(names: Iterable[str]) -> None:
+    """Keep serving ``names`` for another max age after a failed refresh, instead of retrying on every read."""
+    with _lock:
+        manifest = read_manifest()
+        for name in names:
+            if name in manifest:
+                manifest[name]["checked_at"] = time.time()
+        _write_manifest(manifest)
+
+
+def is_stale(name: str, entry: dict | None, max_age: float | None = None) -> bool:
+    if entry is None or not snapshot_path(name).exists():
+        return True
+    # Last fetch or failed refresh attempt
+    checked_at = entry.get("checked_at", entry["fetched_at"])
+    if time.time() - checked_at > (max_age_for(name) if max_age is None else max_age):
+        return True
+    return any(
+        last_invalidated(table) > checked_at
+        for table in referenced_tables(SNAPSHOTS[name])
+    )
+
+
+def read_snapshot(
+    name: str,
+    columns: Sequence[str] | None = None,
+    max_age: float | None = None,
+) -> pd.DataFrame:
+    """Return snapshot ``name`` as a DataFrame, refreshing it from BigQuery if stale.
+
+    Only ``columns`` are read from the file when given. If BigQuery cannot be
+    reached, a stale snapshot is served rather than failing the page, and
+    kept until its max age has passed again.
+    """
+    entry = read_manifest().get(name)
+    if not OFFLINE and is_stale(name, entry, max_age):
+        with _name_lock(name):
+            # Another session may have refreshed it while we waited for the lock
+            entry = read_manifest().get(name)
+            if is_stale(name, entry, max_age):
+                try:
+                    entry = sync_snapshot(name)
+                except Exception:
+                    if entry is None:
+                        raise
+                    logger.exception("Could not refresh snapshot %s, serving the stale copy", name)
+                    _postpone([name])
+    if entry is None:
+        raise FileNotFoundError(f"No snapshot for {name}, run `python -m datalayer.snapshots sync`")
+
+    return load_snapshot_file(name, entry, columns)
+
+
+def load_snapshot_file(name: str, entry: dict, columns: Sequence[str] | None = None) -> pd.DataFrame:
+    """Read the Parquet file behind manifest ``entry`` without any staleness check.
+
+    Years come back as integers and codes as categoricals, see ``datalayer.encoding``.
+    """
+    key = (name, entry["fetched_at"], tuple(columns) if columns else None)
+    with _lock:
+        cached = _frames.get(key)
+        if cached is not None:
+            _frames.move_to_end(key)
+    if cached is not None:
+        return cached[0].copy()
+
+    table = pq.read_table(snapshot_path(name), columns=list(columns) if columns else None, memory_map=True)
+    frame = encode(table.to_pandas())
+    _remember(key, frame)
+    return frame.copy()
+
+
+def _forget(key: tuple) -> None:
+    global _frames_bytes
+    _frames_bytes -= _frames.pop(key)[1]
+
+
+def _remember(key: tuple, frame: pd.DataFrame) -> None:
+    """Keep ``frame`` in memory, evicting the least recently used frames beyond ``MAX_BYTES``."""
+    global _frames_bytes
+    nbytes = int(frame.memory_usage(deep=True).sum())
+    if nbytes > MAX_BYTES:
+        return
+    with _lock:
+        # Older versions of this snapshot are no longer needed
+        for old_key in [k for k in _frames if k[0] == key[0] and (k[1] != key[1] or k == key)]:
+            _forget(old_key)
+        _frames[key] = (frame, nbytes)
+        _frames_bytes += nbytes
+        while _frames_bytes > MAX_BYTES:
+            _forget(next(iter(_frames)))
+
+
+# Code column -> (dimension snapshot, label column)
+DIM_LABELS = {
+    "regso": ("scb_befolkning.dim_regso_deso", "regsonamn"),
+    "kommun": ("scb_befolkning.dim_regso_deso", "kommunnamn"),
+}
+
+
+def code_labels(column: str) -> dict[str, str]:
+    """Code -> name for code column ``column``, from its dimension snapshot."""
+    name, label = DIM_LABELS[column]
+    dim = read_snapshot(name, columns=[column, label]).drop_duplicates(column)
+    return dict(zip(dim[column].astype(str), dim[label]))
+
+
+def data_version(*names: str) -> str:
+    """Identifier of the snapshots' contents, changing whenever any of them is re-synced."""
+    manifest = read_manifest()
+    versions = []
+    for name in names:
+        entry = manifest.get(name)
+        versions.append("missing" if entry is None else f"{entry['schema_hash']}-{entry['fetched_at']:.0f}")
+    return "/".join(versions)
+
+
+def _print_status() -> None:
+    manifest = read_manifest()
+    for name in SNAPSHOTS:
+        entry = manifest.get(name)
+        if entry is None:
+            print(f"{name:50} missing")
+            continue
+        fetched = datetime.datetime.fromtimestamp(entry["fetched_at"]).isoformat(timespec="seconds")
+        state = "stale" if is_stale(name, entry) else "fresh"
+        print(f"{name:50} {entry['row_count']:>8} rows  {fetched}  {state}")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Manage local Parquet snapshots of the BigQuery tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    sync_parser = subparsers.add_parser("sync", help="refresh snapshots from BigQuery")
+    sync_parser.add_argument("names", nargs="*", help="snapshots to refresh (default: all)")
+    subparsers.add_parser("status", help="list snapshots and their age")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in getattr(args, "names", []) if name not in SNAPSHOTS]
+    if unknown:
+        parser.error(f"unknown snapshot(s): {', '.join(unknown)}")
+
+    if args.command == "sync":
+        # Imported here, the aggregates module builds on this one
+        from datalayer.aggregates import build_aggregates
+
+        for name, entry in sync_snapshots(args.names).items():
+            print(f"{name:50} {entry['row_count']:>8} rows")
+        for name, entry in build_aggregates().items():
+            print(f"{name:50} {entry['row_count']:>8} rows")
+    else:
+        _print_status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Sunburst charts that stay small however many companies there are.
+
+``px.sunburst`` with ``path=[..., 'foretag']`` turns every company into a
+sector; with a county-wide DnB export that is tens of thousands of nodes and
+several MB of JSON. ``long_tail_nodes`` builds the hierarchy itself: the
+inner levels are summed, each innermost branch keeps its ``top_k`` largest
+companies and folds the rest into one "Övriga (n st)" node. Pages show the
+whole year that way and draw the companies of one branch only once the user
+picks it (``branch`` in ``long_tail_sunburst``).
+
+The drill-down is a selectbox next to the chart, not a click on a sector:
+``st.plotly_chart`` reports no click events for sunburst charts. A picked
+branch is drawn with at most ``BRANCH_TOP_K`` (500) companies; in branches
+with more than that, the smallest are still folded into "Övriga (n st)".
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import pandas as pd
+import plotly.graph_objects as go
+
+TOP_K = 10
+# Leaves shown when drilling into one branch, the rest still go into OTHER_LABEL
+BRANCH_TOP_K = 500
+OTHER_LABEL = 'Övriga'
+# Label for companies without a sector or branch
+UNKNOWN = 'Okänd'
+
+SEPARATOR = '/'
+
+
+def _labels(column: pd.Series) -> pd.Series:
+    return column.astype(object).where(column.notna(), UNKNOWN).astype(str)
+
+
+def _path_ids(frame: pd.DataFrame, columns: Sequence[str]) -> pd.Series:
+    ids = frame[columns[0]]
+    for column in columns[1:]:
+        ids = ids + SEPARATOR + frame[column]
+    return ids
+
+
+def long_tail_nodes(
+    frame: pd.DataFrame,
+    path: Sequence[str],
+    value: str,
+    top_k: int = TOP_K,
+) -> pd.DataFrame:
+    """Nodes (``id``, ``label``, ``parent``, ``value``) of a sunburst over ``path``.
+
+    The last column of ``path`` names the leaves. Within every parent only the
+    ``top_k`` largest leaves by ``value`` are kept; the others become one node
+    labelled with their count. Negative and missing values count as 0.
+    """
+    groups, leaf = list(path[:-1]), path[-1]
+    frame = frame[list(path) + [value]].copy()
+    for column in groups:
+        frame[column] = _labels(frame[column])
+    frame[value] = frame[value].fillna(0).clip(lower=0)
+
+    nodes = []
+    for depth in range(1, len(groups) + 1):
+        keys = groups[:depth]
+        level = frame.groupby(keys, as_index=False, sort=False)[value].sum()
+        nodes.append(pd.DataFrame({
+            'id': _path_ids(level, keys),
+            'label': level[keys[-1]],
+            'parent': _path_ids(level, keys[:-1]) if depth > 1 else '',
+            'value': level[value],
+        }))
+
+    frame['parent'] = _path_ids(frame, groups)
+    frame = frame.sort_values(value, ascending=False, kind='stable')
+    kept = frame.groupby('parent', sort=False).cumcount() < top_k
+
+    top = frame[kept]
+    nodes.append(pd.DataFrame({
+        # Company names are not unique, the row label is
+        'id': top['parent'] + SEPARATOR + '#' + top.index.astype(str).to_numpy(),
+        'label': top[leaf].astype(str),
+        'parent': top['parent'],
+        'value': top[value],
+    }))
+
+    rest = frame[~kept].groupby('parent', sort=False)[value].agg(['sum', 'size']).reset_index()
+    nodes.append(pd.DataFrame({
+        'id': rest['parent'] + SEPARATOR + OTHER_LABEL,
+        'label': OTHER_LABEL + ' (' + rest['size'].astype(str) + ' st)',
+        'parent': rest['parent'],
+        'value': rest['sum'],
+    }))
+    return pd.concat(nodes, ignore_index=True)
+
+
+def long_tail_sunburst(
+    frame: pd.DataFrame,
+    path: Sequence[str],
+    value: str,
+    value_label: str,
+    top_k: int = TOP_K,
+    branch: Sequence[str] | None = None,
+    colorway: Sequence[str] | None = None,
+) -> go.Figure:
+    """Sunburst of ``long_tail_nodes``.
+
+    With ``branch``, the values of the first ``len(branch)`` columns of
+    ``path``, only that branch is drawn, with up to ``BRANCH_TOP_K`` leaves
+    and the remaining companies of the branch folded into one "Övriga" node.
+    """
+    if branch:
+        mask = pd.Series(True, index=frame.index)
+        for column, selected in zip(path, branch):
+            mask &= _labels(frame[column]) == str(selected)
+        frame = frame[mask]
+        path = list(path[len(branch) - 1:])
+        top_k = BRANCH_TOP_K
+    nodes = long_tail_nodes(frame, path, value, top_k)
+
+    fig = go.Figure(go.Sunburst(
+        ids=nodes['id'],
+        labels=nodes['label'],
+        parents=nodes['parent'],
+        values=nodes['value'],
+        branchvalues='total',
+        hovertemplate=f'%{{label}}<br>{value_label}: %{{value:,.0f}}<extra></extra>',
+    ))
+    fig.update_layout(margin=dict(t=0, l=0, r=0, b=0), sunburstcolorway=list(colorway or []) or None)
+    return fig
@@ -0,0 +1,211 @@
+"""Partitioning and clustering of the analytical BigQuery tables.
+
+Every table is range-partitioned on its integer year column and clustered on
+the columns the dashboards filter and join on, so a query for one year or one
+municipality only scans (and bills) those blocks. Tables created by the
+loaders get their layout from ``LAYOUTS`` through ``apply_layout`` and the
+load jobs in ``datalayer.bq_load``.
+
+Existing tables, created unpartitioned with years stored as STRING, are
+rebuilt with::
+
+    python -m datalayer.table_layouts status
+    python -m datalayer.table_layouts migrate [--dry-run] [table ...]
+
+The migration copies each table into a partitioned, clustered table with an
+INT64 year column (``CREATE TABLE ... AS SELECT``), keeps the original as
+``<table>_unpartitioned`` and swaps the names, all in one script that puts the
+original back if any step fails.
+"""
+from __future__ import annotations
+
+import argparse
+import textwrap
+import uuid
+from dataclasses import dataclass
+from typing import Sequence
+
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+
+@dataclass(frozen=True)
+class TableLayout:
+    year_column: str
+    cluster: tuple[str, ...]
+    first_year: int = 1960
+    # Forecast tables reach far ahead
+    last_year: int = 2100
+
+    @property
+    def range_partitioning(self) -> bigquery.RangePartitioning:
+        return bigquery.RangePartitioning(
+            field=self.year_column,
+            range_=bigquery.PartitionRange(start=self.first_year, end=self.last_year + 1, interval=1),
+        )
+
+    def ddl(self) -> str:
+        """PARTITION BY and CLUSTER BY clauses for a CREATE TABLE statement."""
+        return (
+            f"PARTITION BY RANGE_BUCKET({self.year_column}, GENERATE_ARRAY({self.first_year}, {self.last_year + 1}, 1))\n"
+            f"CLUSTER BY {', '.join(self.cluster)}"
+        )
+
+
+LAYOUTS = {
+    "scb_befolkning.folkmangd": TableLayout("ar", ("kommun",)),
+    "scb_befolkning.folkmangd_prognos": TableLayout("ar", ("kommun",)),
+    "scb_befolkning.regso_folkmangd": TableLayout("ar", ("regso",)),
+    "scb_befolkning.regso_folkmangd_halland": TableLayout("ar", ("regso",)),
+    "scb_befolkning.regso_socio_halland": TableLayout("ar", ("regso",)),
+    "scb_befolkning.regso_kon_inkomst_halland": TableLayout("ar", ("regso", "kon")),
+    "scb_befolkning.regso_transfereringar_halland": TableLayout("ar", ("regso",)),
+    "scb_budget.kommun_kostnader": TableLayout("ar", ("kommun",)),
+    "scb_budget.kommunala_skulden_investeringar": TableLayout("ar", ("kommunkod",)),
+    "dnb_data.dnb_ab_falkenberg": TableLayout("bokslutsar", ("bransch_grov",)),
+}
+
+
+def layout_for(table_id: str) -> TableLayout | None:
+    """Layout of ``table_id`` given as ``[project.]dataset.table[$partition]``."""
+    name = table_id.split("$", 1)[0]
+    return LAYOUTS.get(".".join(name.split(".")[-2:]))
+
+
+def apply_layout(table: bigquery.Table) -> bigquery.Table:
+    """Set partitioning and clustering on a table about to be created, if it has a layout."""
+    layout = layout_for(f"{table.dataset_id}.{table.table_id}")
+    if layout is not None:
+        table.range_partitioning = layout.range_partitioning
+        table.clustering_fields = list(layout.cluster)
+    return table
+
+
+def apply_layout_to_job(job_config: bigquery.LoadJobConfig, destination: str) -> bigquery.LoadJobConfig:
+    """Partition and cluster the table a load job creates like its layout says."""
+    layout = layout_for(destination)
+    if layout is not None:
+        job_config.range_partitioning = layout.range_partitioning
+        job_config.clustering_fields = list(layout.cluster)
+    return job_config
+
+
+def is_migrated(table: bigquery.Table, layout: TableLayout) -> bool:
+    partitioning = table.range_partitioning
+    year_type = next((field.field_type for field in table.schema if field.name == layout.year_column), None)
+    return (
+        partitioning is not None
+        and partitioning.field == layout.year_column
+        and list(table.clustering_fields or []) == list(layout.cluster)
+        and year_type in ("INTEGER", "INT64")
+    )
+
+
+def migration_sql(project: str, name: str, layout: TableLayout, suffix: str | None = None) -> str:
+    """Script that rebuilds ``name`` (``dataset.table``) with ``layout``.
+
+    The copy is built under a name unique to the run (``suffix``), then the
+    original is renamed to ``<table>_unpartitioned`` and the copy to ``<table>``.
+    BigQuery cannot rename tables inside a transaction, so if a step fails the
+    exception handler renames the original back and drops the copy.
+    """
+    dataset, table = name.split(".")
+    year = layout.year_column
+    staging = f"{table}_partitioned_{suffix or uuid.uuid4().hex}"
+    backup = f"{table}_unpartitioned"
+    tables = f"`{project}.{dataset}.INFORMATION_SCHEMA.TABLES`"
+    steps = (
+        f"CREATE TABLE `{project}.{dataset}.{staging}`\n"
+        f"{layout.ddl()}\n"
+        f"AS SELECT * REPLACE (SAFE_CAST({year} AS INT64) AS {year})\n"
+        f"FROM `{project}.{dataset}.{table}`;\n"
+        f"ALTER TABLE `{project}.{dataset}.{table}` RENAME TO `{backup}`;\n"
+        f"ALTER TABLE `{project}.{dataset}.{staging}` RENAME TO `{table}`;"
+    )
+    rollback = (
+        f"IF NOT EXISTS (SELECT 1 FROM {tables} WHERE table_name = '{table}') THEN\n"
+        f"  ALTER TABLE `{project}.{dataset}.{backup}` RENAME TO `{table}`;\n"
+        f"END IF;\n"
+        f"DROP TABLE IF EXISTS `{project}.{dataset}.{staging}`;\n"
+        f"RAISE USING MESSAGE = @@error.message;"
+    )
+    return f"BEGIN\n{textwrap.indent(steps, '  ')}\nEXCEPTION WHEN ERROR THEN\n{textwrap.indent(rollback, '  ')}\nEND"
+
+
+def _exists(client: bigquery.Client, name: str) -> bool:
+    try:
+        client.get_table(name)
+    except NotFound:
+        return False
+    return True
+
+
+def migrate(names: Sequence[str] | None = None, dry_run: bool = False) -> list[str]:
+    """Rebuild the given tables (default: all in ``LAYOUTS``) that are not laid out yet.
+
+    Returns the names of the migrated tables.
+    """
+    from datalayer.bigquery_client import get_client
+    from datalayer.query_cache import invalidate_tables
+
+    client = get_client()
+    migrated = []
+    for name in names or LAYOUTS:
+        layout = LAYOUTS[name]
+        try:
+            table = client.get_table(name)
+        except NotFound:
+            print(f"{name:50} missing, skipped")
+            continue
+        if is_migrated(table, layout):
+            print(f"{name:50} already partitioned")
+            continue
+        backup = f"{name}_unpartitioned"
+        if _exists(client, backup):
+            print(f"{name:50} skipped, {backup} exists from an earlier migration")
+            continue
+        script = migration_sql(client.project, name, layout)
+        print(script + ";")
+        if not dry_run:
+            client.query(script).result()
+        migrated.append(name)
+    if migrated and not dry_run:
+        invalidate_tables(migrated)
+    return migrated
+
+
+def _print_status() -> None:
+    from datalayer.bigquery_client import get_client
+
+    client = get_client()
+    for name, layout in LAYOUTS.items():
+        try:
+            table = client.get_table(name)
+        except NotFound:
+            print(f"{name:50} missing")
+            continue
+        state = "partitioned" if is_migrated(table, layout) else "needs migration"
+        print(f"{name:50} {table.num_rows:>10} rows  {table.num_bytes / 1024 ** 2:8.1f} MB  {state}")
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Partition and cluster the analytical BigQuery tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="rebuild tables with their layout")
+    migrate_parser.add_argument("names", nargs="*", help="tables to migrate (default: all)")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="only print the statements")
+    subparsers.add_parser("status", help="show which tables are partitioned")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in getattr(args, "names", []) if name not in LAYOUTS]
+    if unknown:
+        parser.error(f"unknown table(s): {', '.join(unknown)}")
+
+    if args.command == "migrate":
+        migrate(args.names, dry_run=args.dry_run)
+    else:
+        _print_status()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Warm every page's data dependencies in the background.
+
+The first visitor after a deploy or after the caches expire would otherwise
+pay for every BigQuery refresh, PxWeb request and GeoJSON simplification. The
+warm-up walks all of them in parallel: the snapshots and aggregates behind
+pages 1-9, the external PxWeb responses of pages 10-12 and the regso
+geometries of pages 2 and 4. ``Home.py`` starts it once per server process
+and repeats it every ``INTERVAL`` seconds; it can also be run by hand::
+
+    python -m datalayer.warmup
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Sequence
+
+from datalayer.aggregates import AGGREGATES, read_aggregate
+from datalayer.external import EXTERNAL_REQUESTS
+from datalayer.geo import REGSO_FILES, load_regso_geojson
+from datalayer.snapshots import SNAPSHOTS, read_snapshot, refresh_snapshots
+
+logger = logging.getLogger(__name__)
+
+# Repeat the warm-up this often, in seconds; shorter than the snapshot and response TTLs
+INTERVAL = 3 * 60 * 60
+
+MAX_WORKERS = 8
+
+
+@dataclass
+class TaskStatus:
+    state: str = "pending"
+    seconds: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+
+
+def _tasks() -> dict[str, Callable[[], object]]:
+    tasks: dict[str, Callable[[], object]] = {}
+    for name in SNAPSHOTS:
+        tasks[f"snapshot {name}"] = lambda name=name: read_snapshot(name)
+    for name in AGGREGATES:
+        tasks[f"aggregate {name}"] = lambda name=name: read_aggregate(name)
+    for name, request in EXTERNAL_REQUESTS.items():
+        tasks[f"http {name}"] = request.fetch
+    for area in REGSO_FILES:
+        tasks[f"geojson {area}"] = lambda area=area: load_regso_geojson(area)
+    return tasks
+
+
+_lock = threading.Lock()
+_status: dict[str, TaskStatus] = {}
+_thread: threading.Thread | None = None
+
+
+def _run_task(name: str, task: Callable[[], object]) -> None:
+    with _lock:
+        _status[name] = TaskStatus("running")
+    start = time.perf_counter()
+    try:
+        task()
+    except Exception as e:
+        logger.exception("Warm-up of %s failed", name)
+        status = TaskStatus("failed", time.perf_counter() - start, time.time(), str(e))
+    else:
+        status = TaskStatus("warm", time.perf_counter() - start, time.time())
+    with _lock:
+        _status[name] = status
+
+
+def run_warmup(names: Sequence[str] | None = None) -> dict[str, TaskStatus]:
+    """Warm the given tasks, or all of them, and return their status."""
+    tasks = _tasks()
+    if names is not None:
+        tasks = {name: tasks[name] for name in names}
+
+    # One concurrent round of BigQuery jobs for all stale snapshots first
+    refresh_snapshots([name.split(" ", 1)[1] for name in tasks if name.startswith("snapshot ")])
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        for name, task in tasks.items():
+            executor.submit(_run_task, name, task)
+    return warmup_status()
+
+
+def _loop(interval: float | None) -> None:
+    while True:
+        start = time.perf_counter()
+        try:
+            status = run_warmup()
+        except Exception:
+            logger.exception("Warm-up failed")
+        else:
+            failed = [name for name, task in status.items() if task.state == "failed"]
+            logger.info(
+                "Warm-up finished in %.1f s, %d of %d warm",
+                time.perf_counter() - start, len(status) - len(failed), len(status),
+            )
+        if not interval:
+            return
+        time.sleep(interval)
+
+
+def start_background(interval: float | None = INTERVAL) -> bool:
+    """Start the warm-up thread unless it is already running; returns whether it was started."""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return False
+        _thread = threading.Thread(target=_loop, args=(interval,), name="datalayer-warmup", daemon=True)
+        _thread.start()
+        return True
+
+
+def warmup_status() -> dict[str, TaskStatus]:
+    """State, duration and error of every task from the most recent warm-up."""
+    with _lock:
+        return dict(_status)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    for name, task in run_warmup().items():
+        seconds = f"{task.seconds:6.2f} s" if task.seconds is not None else ""
+        print(f"{name:60} {task.state:8} {seconds}  {task.error or ''}")
+
+
+if __name__ == "__main__":
+    main()
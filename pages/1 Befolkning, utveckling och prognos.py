@@ -1,130 +1,49 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.aggregates import read_aggregate
+from datalayer.animation import optimize_animation
+from datalayer.figure_cache import cached_figure
+from datalayer.growth import cagr_to_reference
+from datalayer.snapshots import data_version
 import pandas as pd
 import plotly.express as px
 
 st.set_page_config(layout="centered")
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
-
-
-# Fetch data from BigQuery into a pandas DataFrame
-query = '''
-SELECT
-    alder, 
-    'Falkenberg' as kommun,
-    ar,
-    sum(folkmangd) as folkmangd 
-FROM `falkenbergcloud.scb_befolkning.folkmangd`
-WHERE kommun = '1382'
-GROUP BY
-alder, kommun, ar
-'''
-df = client.query(query).to_dataframe()
-
-# Process data
-df['age_group'] = (df['alder'].str.replace("+", "").astype(int) // 10) * 10
-df = df.groupby(['age_group', 'ar'])['folkmangd'].sum().reset_index()
-df['age_group_label'] = df['age_group'].apply(lambda x: f"{x}-{x+9} år").str.replace("-109", "+")
-df.rename(columns={
-    'age_group': "Åldersgrupp",
-    'ar': 'År',
-    'folkmangd': 'Befolkningsmängd',
-    'age_group_label': 'Åldersgrupper'
-}, inplace=True)
-
-
-
+# Falkenberg's population per 10-year age group and year, precomputed after each load
+df = read_aggregate('agg.folkmangd_aldersgrupp')
 
 df_cagr = df.copy()
 
-def compute_cagr(end_value, start_value, years_diff):
-    """Compute the CAGR given starting and ending values and number of years."""
-    return ((end_value / start_value) ** (1/years_diff) - 1) #* 100
-
-df_cagr['CAGR % to current year'] = 0.0
-
-# Convert the year values to integers while fetching the maximum year
-end_year = int(df_cagr['År'].max())
-
-# Loop over each unique year in our dataset.
-# Convert each year to an integer before using it.
-for year in df_cagr['År'].unique():
-    year = int(year)
-    mask = df_cagr['År'] == str(year)
-    
-    end_values = df_cagr[df_cagr['År'] == str(end_year)].set_index('Åldersgrupp')['Befolkningsmängd']
-    
-    for group in df_cagr['Åldersgrupp'].unique():
-        start_value = df_cagr.loc[mask & (df_cagr['Åldersgrupp'] == group), 'Befolkningsmängd'].values[0]
-        
-        if group in end_values:
-            end_value = end_values[group]
-            years_diff = end_year - year
-            
-            # Skip the computation if years_diff is zero
-            if years_diff == 0:
-                continue
-            
-            cagr_value = compute_cagr(end_value, start_value, years_diff)
-            
-            df_cagr.loc[mask & (df_cagr['Åldersgrupp'] == group), 'CAGR % to current year'] = cagr_value
-
-
-
-
-# Fetch data from BigQuery into a pandas DataFrame
-
-query_prog = '''
-SELECT
-    alder, 
-    'Falkenberg' as kommun,
-    ar,
-    sum(folkmangd) as folkmangd 
-FROM `falkenbergcloud.scb_befolkning.folkmangd_prognos`
-WHERE kommun = '1382'
-GROUP BY
-alder, kommun, ar
-'''
-df_prog = client.query(query_prog).to_dataframe()
-
-# Process data
-df_prog['age_group'] = (df_prog['alder'].str.replace("+", "").astype(int) // 10) * 10
-df_prog = df_prog.groupby(['age_group', 'ar'])['folkmangd'].sum().round().reset_index()
-df_prog['age_group_label'] = df_prog['age_group'].apply(lambda x: f"{x}-{x+9} år").str.replace("-109", "+")
-df_prog.rename(columns={
-    'age_group': "Åldersgrupp",
-    'ar': 'År',
-    'folkmangd': 'Befolkningsmängd',
-    'age_group_label': 'Åldersgrupper'
-}, inplace=True)
-
+# CAGR from each year to the latest year, per age group
+df_cagr['CAGR % to current year'] = cagr_to_reference(df_cagr, 'År', 'Åldersgrupp', 'Befolkningsmängd')
 
+# The population forecast per 10-year age group and year, precomputed after each load
+df_prog = read_aggregate('agg.folkmangd_prognos_aldersgrupp')
 
 # Create plots
-min_value, max_value = df['Befolkningsmängd'].min(), df['Befolkningsmängd'].max()
-fig = px.bar(df,
-             x='Befolkningsmängd',
-             y='Åldersgrupper',
-             animation_frame='År',
-             color='Åldersgrupp',
-             labels={'Befolkningsmängd': 'Befolkningsmängd', 'Åldersgrupp': 'Åldersgrupp'},
-             orientation='h',
-             color_continuous_scale='agsunset',
-             text=df['Befolkningsmängd'],
-             height=700,
-             width=700)
-fig.update_traces(textposition='outside')
-fig.update_layout(xaxis=dict(range=[min_value, max_value]))
-fig.update_layout(coloraxis_showscale=False)
+def build_age_animation(df, name, every=1):
+    """Animated horizontal bars of the population per age group, one frame per ``every`` years."""
+    min_value, max_value = df['Befolkningsmängd'].min(), df['Befolkningsmängd'].max()
+    fig = px.bar(df,
+                 x='Befolkningsmängd',
+                 y='Åldersgrupper',
+                 animation_frame='År',
+                 color='Åldersgrupp',
+                 labels={'Befolkningsmängd': 'Befolkningsmängd', 'Åldersgrupp': 'Åldersgrupp'},
+                 orientation='h',
+                 color_continuous_scale='agsunset',
+                 text=df['Befolkningsmängd'],
+                 height=700,
+                 width=700)
+    fig.update_traces(textposition='outside')
+    fig.update_layout(xaxis=dict(range=[min_value, max_value]))
+    fig.update_layout(coloraxis_showscale=False)
+    return optimize_animation(fig, name, every=every)
+
+
+# The animated charts are only rebuilt when the underlying aggregate changes
+fig = cached_figure('befolkning.aldersgrupper', data_version('agg.folkmangd_aldersgrupp'),
+                    lambda: build_age_animation(df, 'befolkning.aldersgrupper'))
 
 df_pop = df.groupby(['År'])['Befolkningsmängd'].sum().reset_index()
 fig2 = px.bar(df_pop,
@@ -138,22 +57,10 @@ fig2 = px.bar(df_pop,
 fig2.update_layout(coloraxis_showscale=False, yaxis_title=None)
 
 
-# prog charts
-min_value, max_value = df_prog['Befolkningsmängd'].min(), df_prog['Befolkningsmängd'].max()
-fig_prog = px.bar(df_prog,
-             x='Befolkningsmängd',
-             y='Åldersgrupper',
-             animation_frame='År',
-             color='Åldersgrupp',
-             labels={'Befolkningsmängd': 'Befolkningsmängd', 'Åldersgrupp': 'Åldersgrupp'},
-             orientation='h',
-             color_continuous_scale='agsunset',
-             text=df_prog['Befolkningsmängd'],
-             height=700,
-             width=700)
-fig_prog.update_traces(textposition='outside')
-fig_prog.update_layout(xaxis=dict(range=[min_value, max_value]))
-fig_prog.update_layout(coloraxis_showscale=False)
+# prog charts, every second forecast year (and the last) is enough for the animation
+fig_prog = cached_figure('befolkning.aldersgrupper_prognos', data_version('agg.folkmangd_prognos_aldersgrupp'),
+                         lambda: build_age_animation(df_prog, 'befolkning.aldersgrupper_prognos', every=2),
+                         params={'every': 2})
 
 
 df_prog_pop = df_prog.groupby(['År'])['Befolkningsmängd'].sum().reset_index()
@@ -168,10 +75,6 @@ fig2_prog.update_layout(coloraxis_showscale=False, yaxis_title=None)
 
 config = {'displaylogo': False, 'use_container_width': True}
 
-
-
-
-
 # st.subheader('Befolkning i grafer')
 st.subheader('Befolkningsutveckling sedan 1968')
 st.plotly_chart(fig2, config=config)
@@ -181,18 +84,15 @@ st.subheader('Folkmängd 10-års åldersgrupper sedan 1968, animerad')
 st.plotly_chart(fig, config=config)
 
 
-# color=st.selectbox('välj färg',  ['ggplot2', 'seaborn', 'simple_white', 'plotly',
-#          'plotly_white', 'plotly_dark', 'presentation', 'xgridoff',
-#          'ygridoff', 'gridon', 'none'])
-
-# fig_cagr = px.line(df_cagr, x='År', 
-#                    y='CAGR % to current year', 
-#                    line_group='Åldersgrupper', 
-#                    color='Åldersgrupper',
-#                    template=color,)
-# # Update y-axis format to percentage
-# fig_cagr.update_yaxes(tickformat="%", range=[-0.03, 0.06]) #tickformat="%", 
-# st.plotly_chart(fig_cagr, config=config)
+st.subheader('Årlig tillväxttakt (CAGR) fram till senaste året, per åldersgrupp')
+fig_cagr = px.line(df_cagr, x='År', 
+                   y='CAGR % to current year', 
+                   line_group='Åldersgrupper', 
+                   color='Åldersgrupper',
+                   labels={'CAGR % to current year': 'CAGR till senaste året'})
+# Update y-axis format to percentage
+fig_cagr.update_yaxes(tickformat="%", range=[-0.03, 0.06])
+st.plotly_chart(fig_cagr, config=config)
 
 st.subheader('Befolkningsprognos till 2070')
 st.plotly_chart(fig2_prog, config=config)
@@ -1,51 +1,13 @@
 import streamlit as st
-import requests
-import json
+from datalayer.external import SOLCELLER
 import pandas as pd
 import plotly.express as px
 
-# Replace with your actual URL
-url = "http://pxexternal.energimyndigheten.se/api/v1/sv/Nätanslutna solcellsanläggningar/EN0123_2.px"
-
-# Define the header for the POST request
-headers = {
-    'Content-Type': 'application/json',
-}
-
-# Define the body for the POST request
-payload = {
-    "query": [
-        {
-            "code": "Område",
-            "selection": {
-                "filter": "item",
-                "values": [
-                    "0",
-                    "11",
-                    "151",
-                    "153",
-                    "154"
-                ]
-            }
-        }
-    ],
-    "response": {
-        "format": "json"
-    }
-}
-
-# Send the POST request
-response = requests.post(url, headers=headers, json=payload)
-
-# Check if the request was successful (status code 200)
-if response.status_code == 200:
-    # Load the JSON data from the response
-    response_data = response.json()
-    
-    # Print or further process the JSON data
-    print(json.dumps(response_data, indent=4))
-else:
-    st.error(f'Failed to retrieve data from Energimyndigheten, response code: {response.status_code}')
+# Send the POST request, served from the response cache while Energimyndigheten has not updated the table
+try:
+    response_data = SOLCELLER.fetch()
+except Exception as e:
+    st.error(f'Failed to retrieve data from Energimyndigheten: {e}')
     st.stop()  # This will halt the execution of the app
 
 # The rest of your code remains the same, but we'll wrap it in a function and only call it if we have data
@@ -140,6 +102,4 @@ def process_and_display_data(response_data):
     link = 'https://pxexternal.energimyndigheten.se/pxweb/sv/Nätanslutna%20solcellsanläggningar/-/EN0123_2.px/'
     st.write(f'källa: [energimyndigheten]({link}) statistikdatabas')
 
-# Only process and display data if we successfully retrieved it
-if response.status_code == 200:
-    process_and_display_data(response_data)
\ No newline at end of file
+process_and_display_data(response_data)
\ No newline at end of file
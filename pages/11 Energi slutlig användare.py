@@ -1,61 +1,9 @@
 import streamlit as st
-import requests
-import plotly.express as px
+from datalayer.external import SLUTANVANDNING_KATEGORI
+from datalayer.sankey import sankey_flows
+import pandas as pd
 import plotly.graph_objects as go
 
-url = 'https://api.scb.se/OV0104/v1/doris/sv/ssd/START/EN/EN0203/EN0203A/SlutAnvSektor'
-
-body = {
-  "query": [
-    {
-      "code": "Region",
-      "selection": {
-        "filter": "item",
-        "values": [
-          "1382"
-        ]
-      }
-    },
-    {
-      "code": "Forbrukningskategri",
-      "selection": {
-        "filter": "item",
-        "values": [
-          "911", "921", "931", "941", "951", "98", "97", "964"
-        ]
-      }
-    },
-    {
-      "code": "Bransle",
-      "selection": {
-        "filter": "item",
-        "values": [
-          "905",
-          "910",
-          "915",
-          "920",
-          "925",
-          "930",
-          "14",
-          "16"
-        ]
-      }
-    },
-    {
-      "code": "Tid",
-      "selection": {
-        "filter": "item",
-        "values": [
-          "2021"
-        ]
-      }
-    }
-  ],
-  "response": {
-    "format": "json"
-  }
-}
-
 # Create a mapping from codes to descriptions in Swedish
 code_to_description = {
     "911": "slutanv. jordbruk, skogsbruk, fiske",
@@ -77,56 +25,32 @@ code_to_description = {
 }
 
 
-response = requests.post(url=url, json=body)
-
-if response.status_code != 200:
-    raise ValueError('Failed to retrieve data from the server. ')
-json_response = response.json()
+# Cached on disk, SCB is only asked again once the table has been updated
+try:
+    json_response = SLUTANVANDNING_KATEGORI.fetch()
+except Exception as e:
+    raise ValueError('Failed to retrieve data from the server. ') from e
 
-# Create a dictionary of unique items with their respective indices
-unique_items = {}
-counter = 0
-for item in json_response["data"]:
-    for idx, sub_item in enumerate(item["key"]):
-        if idx == 0:  # Skip the first key
-            continue
-        if sub_item not in unique_items:
-            unique_items[sub_item] = counter
-            counter += 1
+# One row per PxWeb cell, with the key variables as columns
+codes = [column["code"] for column in json_response["columns"] if column["type"] != "c"]
+df = pd.DataFrame([item["key"] for item in json_response["data"]], columns=codes)
+df["value"] = [item["values"][0] for item in json_response["data"]]
 
-# Create more descriptive labels using the Swedish descriptions mapping
-labels = [code_to_description.get(key, key) for key in unique_items.keys()]
+# Descriptive Swedish labels, looked up once per code
+for code in ["Forbrukningskategri", "Bransle"]:
+    df[code] = df[code].map(lambda key: code_to_description.get(key, key))
 
-
-# Create the source, target, and value lists
-source = []
-target = []
-value = []
-
-for item in json_response["data"]:
-    for idx, sub_item in enumerate(item["key"][:-1]):
-        if idx == 0:  # Skip the first key for source, target linking
-            continue
-        target.append(unique_items[sub_item])
-        source.append(unique_items[item["key"][idx + 1]])
-        value.append(int(item["values"][0]))
+# Flows year -> energy source -> consumer category
+flows = sankey_flows(df, levels=["Tid", "Bransle", "Forbrukningskategri"], value="value")
 
 # Create Sankey chart
-fig = go.Figure(data=[go.Sankey(
+fig = go.Figure(data=[flows.trace(
     node=dict(
         pad=20,
         thickness=20,
         line=dict(color="black", width=0.5),
-        label=labels,  # Use the descriptive labels
-    ),
-
-    link=dict(
-        source=source,
-        target=target,
-        value=value,
-        # color='rgba(1, 75, 255, 0.4)',
-        
     ),
+    # link=dict(color='rgba(1, 75, 255, 0.4)'),
     arrangement='freeform'
     )])
 
@@ -1,14 +1,14 @@
 import streamlit as st
 import pandas as pd
-import requests
+from datalayer.external import SLUTANVANDNING_BRANSLE
 import plotly.express as px
 import base64
 
-# Function to fetch data
-@st.cache_data
-def fetch_data(url, body):
-    response = requests.post(url, json=body)
-    return response.json()
+# Function to fetch data, cached on disk and revalidated against the table's update time.
+# Kept in memory for a few minutes too, so widget interactions do not parse the response again
+@st.cache_data(ttl=10 * 60, max_entries=1)
+def fetch_data():
+    return SLUTANVANDNING_BRANSLE.fetch()
 
 # Function to map codes to descriptions
 def map_codes(data, code_map, renewable_sources):
@@ -68,41 +68,6 @@ def generate_download_link(df, filename, text):
 def main():
     st.title("Andel fossilfri energi som ratio av total energikonsumtion")
 
-    url = 'https://api.scb.se/OV0104/v1/doris/sv/ssd/START/EN/EN0203/EN0203A/SlutAnvSektor'
-
-    body = {
-  "query": [
-    {
-      "code": "Region",
-      "selection": {
-        "filter": "item",
-        "values": [
-          "1382"
-        ]
-      }
-    },
-    {
-      "code": "Bransle",
-      "selection": {
-        "filter": "item",
-        "values": [
-          "905",
-          "910",
-          "915",
-          "920",
-          "925",
-          "930",
-          "14",
-          "16"
-        ]
-      }
-    }
-  ],
-  "response": {
-    "format": "json"
-  }
-}
-
     # Create a mapping from codes to descriptions in Swedish
     code_to_description = {
         "911": "slutanv. jordbruk, skogsbruk, fiske",
@@ -131,7 +96,7 @@ def main():
         return href
     
     # Fetch and map data
-    raw_data = fetch_data(url, body)
+    raw_data = fetch_data()
     mapped_data = map_codes(raw_data['data'], code_to_description, renewable_sources)
 
     df = create_dataframe(mapped_data)
@@ -0,0 +1,48 @@
+import streamlit as st
+from datalayer.companies import company_cube
+import plotly.express as px
+
+st.title("Företagshistorik")
+
+# Samma förberäknade kub som sidorna 8 och 9, med historiken per org_nummer
+cube = company_cube()
+history = cube.history
+
+sokord = st.text_input('Sök företag:', placeholder='Början av ett ord i företagsnamnet')
+traffar = history.search(sokord, limit=50) if sokord else []
+
+if sokord and not traffar:
+    st.write(f'Inga företag matchar "{sokord}".')
+
+if traffar:
+    org_nummer = st.selectbox(
+        'Välj företag:',
+        traffar,
+        format_func=lambda org: f'{history.names[org]} ({org})',
+    )
+    df = history.history(org_nummer).tail(10)  # De senaste tio bokslutsåren
+
+    st.header(history.names[org_nummer])
+    st.write(f'Org.nr {org_nummer}, bransch: {df["bransch_grov"].iloc[-1]}')
+
+    col1, col2 = st.columns(2)
+    with col1:
+        fig_omsattning = px.bar(df, x='bokslutsar', y='omsattning', title='Omsättning (tkr)',
+                                labels={'bokslutsar': 'År', 'omsattning': 'Omsättning tkr'})
+        st.plotly_chart(fig_omsattning, use_container_width=True)
+    with col2:
+        fig_anstallda = px.bar(df, x='bokslutsar', y='anstallda', title='Antal anställda',
+                               labels={'bokslutsar': 'År', 'anstallda': 'Anställda'})
+        st.plotly_chart(fig_anstallda, use_container_width=True)
+
+    col3, col4 = st.columns(2)
+    with col3:
+        fig_resultat = px.line(df, x='bokslutsar', y='resultat', markers=True, title='Resultat (tkr)',
+                               labels={'bokslutsar': 'År', 'resultat': 'Resultat tkr'})
+        st.plotly_chart(fig_resultat, use_container_width=True)
+    with col4:
+        fig_soliditet = px.line(df, x='bokslutsar', y='soliditet', markers=True, title='Soliditet (%)',
+                                labels={'bokslutsar': 'År', 'soliditet': 'Soliditet'})
+        st.plotly_chart(fig_soliditet, use_container_width=True)
+
+    st.dataframe(df.set_index('bokslutsar'))
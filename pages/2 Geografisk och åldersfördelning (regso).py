@@ -1,53 +1,27 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.aggregates import read_aggregate
+from datalayer.figure_cache import cached_figure
+from datalayer.geo import load_regso_geojson
+from datalayer.snapshots import data_version, read_snapshot
 import pandas as pd
-import json
 import plotly.express as px
 
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
 
 
-regsos = client.query('SELECT DISTINCT regsonamn, regso FROM `falkenbergcloud.scb_befolkning.dim_regso_deso`').to_dataframe()
+regsos = read_snapshot('scb_befolkning.dim_regso_deso', columns=['regsonamn', 'regso']).drop_duplicates()
 
 
-# Fetch data from BigQuery into a pandas DataFrame
-query = f'''
-  SELECT
-    ar,
-    regso, 
-    sum(folkmangd) as folkmangd,
-    sum(case when alder in ('75-79','80-') then folkmangd else 0 end) as folkmangd_over_75,
-    sum(case when alder in ('-4','5-9','10-14','15-19') then folkmangd else 0 end) as folkmangd_under_20
-  FROM `falkenbergcloud.scb_befolkning.regso_folkmangd` 
-  GROUP BY ar, regso
-  '''
-query_job = client.query(query)
-df = query_job.to_dataframe()
+# Population per regso and year with under-20/over-75 shares, precomputed after each load
+df = read_aggregate('agg.regso_folkmangd')
 
 df = df.merge(regsos, on='regso', how='left')
-# Calculate the fraction for folkmangd_under_20 as a percentage
-df['folkmangd_under_20%'] = (df['folkmangd_under_20'] / df['folkmangd']) * 100
-# Calculate the fraction for folkmangd_over_75 as a percentage
-df['folkmangd_over_75%'] = (df['folkmangd_over_75'] / df['folkmangd']) * 100
 latest_ar = df['ar'].max()
 df_latest_ar = df[df['ar']==latest_ar]
 
 
-@st.cache_data
-def load_geojson(path):
-    with open(path, 'r') as f:
-        return json.load(f)
-
-# Call the cached function
-geojson = load_geojson('pages/geodata/regso_falkenberg.geojson')
+# Regso polygons simplified and quantized for the map's zoom (REGSO_ZOOM), cached per source file version
+geojson = load_regso_geojson('falkenberg')
 
 st.header("Geografisk- samt åldersfördelning i Falkenberg")
 
@@ -77,42 +51,50 @@ st.write(fig)
 st.write('Regionalt statistikområde Falkenberg Södra (Herting, Hjortsberg, Kristineslätt, Slätten och Näset) är Falkenbergs folkrikaste område. ')
 
 # Create a bubble plot using plotly
-bubble_fig = px.scatter(df,
-                        y='folkmangd_over_75%',
-                        x='folkmangd_under_20%',
-                        size=df['folkmangd'].tolist(),
-                        animation_frame='ar',
-                        text=df['regsonamn'],
-                        color='folkmangd',  # Color the bubbles based on folkmangd
-                        color_continuous_scale="temps",  
-                        hover_name='regsonamn',
-                        size_max=60,  # you can adjust this for the maximum bubble size
-                        custom_data=['folkmangd', 'folkmangd_over_75%', 'folkmangd_under_20%'],
-                        # title="Befolkning per område",
-                        height=700,
-                        labels={'folkmangd_over_75%':'Andel över 75 år, i %', 'folkmangd_under_20%': 'Andel under 20 år, i %', 'folkmangd': 'Folkmängd', 'ar': 'År'})
-
-bubble_fig.update_traces(
-    hovertemplate="<br>".join([
-        "Regso Namn: %{hovertext}",
-        "Folkmängd: %{marker.size:,.0f}",
-        "Folkmängd över 75 år: %{y:.2f}%",
-        "Folkmängd under 20 år: %{x:.2f}%"
-    ])
-)
-bubble_fig.update_traces(marker_opacity=0.5)
-bubble_fig.update_traces(marker=dict(line=dict(width=1, color='Coral')))
-bubble_fig.update_traces(textposition='top center')
-bubble_fig.update_layout(
-    xaxis=dict(
-        title_font=dict(size=18),  # Adjust size as needed for x-axis title
-        tickfont=dict(size=16)  # Adjust size as needed for x-axis tick labels
-    ),
-    yaxis=dict(
-        title_font=dict(size=18),  # Adjust size as needed for y-axis title
-        tickfont=dict(size=16)  # Adjust size as needed for y-axis tick labels
+def build_bubble_fig():
+    """Animated bubble chart of the age shares per regso, one frame per year."""
+    bubble_fig = px.scatter(df,
+                            y='folkmangd_over_75%',
+                            x='folkmangd_under_20%',
+                            size=df['folkmangd'].tolist(),
+                            animation_frame='ar',
+                            text=df['regsonamn'],
+                            color='folkmangd',  # Color the bubbles based on folkmangd
+                            color_continuous_scale="temps",  
+                            hover_name='regsonamn',
+                            size_max=60,  # you can adjust this for the maximum bubble size
+                            custom_data=['folkmangd', 'folkmangd_over_75%', 'folkmangd_under_20%'],
+                            # title="Befolkning per område",
+                            height=700,
+                            labels={'folkmangd_over_75%':'Andel över 75 år, i %', 'folkmangd_under_20%': 'Andel under 20 år, i %', 'folkmangd': 'Folkmängd', 'ar': 'År'})
+
+    bubble_fig.update_traces(
+        hovertemplate="<br>".join([
+            "Regso Namn: %{hovertext}",
+            "Folkmängd: %{marker.size:,.0f}",
+            "Folkmängd över 75 år: %{y:.2f}%",
+            "Folkmängd under 20 år: %{x:.2f}%"
+        ])
     )
-)
+    bubble_fig.update_traces(marker_opacity=0.5)
+    bubble_fig.update_traces(marker=dict(line=dict(width=1, color='Coral')))
+    bubble_fig.update_traces(textposition='top center')
+    bubble_fig.update_layout(
+        xaxis=dict(
+            title_font=dict(size=18),  # Adjust size as needed for x-axis title
+            tickfont=dict(size=16)  # Adjust size as needed for x-axis tick labels
+        ),
+        yaxis=dict(
+            title_font=dict(size=18),  # Adjust size as needed for y-axis title
+            tickfont=dict(size=16)  # Adjust size as needed for y-axis tick labels
+        )
+    )
+    return bubble_fig
+
+
+bubble_fig = cached_figure('regso.bubblor',
+                           data_version('agg.regso_folkmangd', 'scb_befolkning.dim_regso_deso'),
+                           build_bubble_fig)
 
 st.write('---')
 st.subheader('Folkmängd per område över tid (med animation)')
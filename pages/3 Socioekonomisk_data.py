@@ -2,47 +2,15 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import json
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.snapshots import read_snapshot
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
-
-regsos = client.query('SELECT DISTINCT kommunnamn, lannamn, regsonamn, regso FROM `falkenbergcloud.scb_befolkning.dim_regso_deso`').to_dataframe()
-
-# Fetch data from BigQuery into a pandas DataFrame
-query = f'''
-  SELECT
-    *
-  FROM `falkenbergcloud.scb_befolkning.regso_socio_halland` 
-  '''
-query_job = client.query(query)
-df = query_job.to_dataframe()
-df['andel_gymnasie_hogre_utbildning_20_64_ar'] = 100 - df['andel_forgymnasial_utbildning_20_64_ar']
-
-# Fetch folkmängd data from BigQuery into a pandas DataFrame
-query_folkmangd = f'''
-  SELECT regso, ar, sum(folkmangd) as folkmangd
-    
-  FROM `falkenbergcloud.scb_befolkning.regso_folkmangd_halland`
-  GROUP BY regso, ar
-  '''
-df_folkmangd = client.query(query_folkmangd).to_dataframe()
 
-
-#merge dataframes
-df = df.merge(regsos, on='regso', how='left')
-
-df = df.merge(df_folkmangd, on=['regso', 'ar'], how='left')
+# Socioeconomic variables, regso names and population for Falkenberg, joined in BigQuery
+df_selected = read_snapshot('view.socio_regso_falkenberg')
 
 
 #
-latest_year = df['ar'].max()
+latest_year = df_selected['ar'].max()
 
 #drop down for selecting kommun and storing it in a variable
 # selected_kommun = st.selectbox('Välj kommun:',df['kommunnamn'].unique().tolist(), )
@@ -62,10 +30,7 @@ column_label_map = {
 }
 
 #for choosing data variable to be displayed in the chart
-#new dataframe for selections
-df_selected = df[df['kommunnamn']=='Falkenberg'] # or selected_kommun] if variable 
-
-selected_cols = df_selected.columns.tolist()[2:8]
+selected_cols = list(column_label_map)
 
 
 fig = px.scatter(df_selected[df_selected['ar']==latest_year], 
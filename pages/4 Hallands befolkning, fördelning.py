@@ -1,34 +1,16 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.aggregates import read_aggregate
+from datalayer.snapshots import read_snapshot
 import pandas as pd
 import json
 import plotly.express as px
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
 
-regsos = client.query('SELECT DISTINCT regsonamn, lannamn, kommunnamn, regso FROM `falkenbergcloud.scb_befolkning.dim_regso_deso`').to_dataframe()
+regsos = read_snapshot('scb_befolkning.dim_regso_deso', columns=['regsonamn', 'lannamn', 'kommunnamn', 'regso']).drop_duplicates()
 st.header("Här bor man i Halland")
 
-# Fetch data from BigQuery into a pandas DataFrame
-query = f'''
-  SELECT
-    ar,
-    regso, 
-    sum(folkmangd) as folkmangd,
-    sum(case when alder in ('75-79','80-') then folkmangd else 0 end) as folkmangd_over_75,
-    sum(case when alder in ('-4','5-9','10-14','15-19') then folkmangd else 0 end) as folkmangd_under_20
-  FROM `falkenbergcloud.scb_befolkning.regso_folkmangd_halland` 
-  GROUP BY ar, regso
-  '''
-query_job = client.query(query)
-df = query_job.to_dataframe()
+# Population per regso and year, precomputed after each load
+df = read_aggregate('agg.regso_folkmangd_halland')
 
 df = df.merge(regsos,on='regso', how='left')
 st.write('Fördelning av befolkningen i Halland per kommun och regionalt område')
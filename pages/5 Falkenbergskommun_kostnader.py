@@ -1,36 +1,31 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.encoding import with_labels
+from datalayer.sankey import sankey_flows_by
+from datalayer.snapshots import code_labels, read_snapshot, refresh_snapshots
 import pandas as pd
 import json
 import plotly.express as px
 from plotly import graph_objects as go
 import plotly.graph_objs as go
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
 
-verksamhetsomrade = client.query('SELECT * FROM `falkenbergcloud.scb_budget.dim_verksamhetsomrade_kommun`').to_dataframe()
-kommun = client.query('SELECT DISTINCT kommun, kommunnamn FROM `falkenbergcloud.scb_befolkning.dim_regso_deso`').to_dataframe()
+# Refresh everything this page reads in one round of concurrent BigQuery jobs
+refresh_snapshots([
+    'scb_budget.dim_verksamhetsomrade_kommun',
+    'scb_befolkning.dim_regso_deso',
+    'scb_budget.kommun_kostnader',
+])
+
+verksamhetsomrade = read_snapshot('scb_budget.dim_verksamhetsomrade_kommun')
 st.header("Kommunens kostnadsfördelning per räkenskapsår")
 
-# Fetch data from BigQuery into a pandas DataFrame
-query = f'''
-  SELECT
-    *
-  FROM `falkenbergcloud.scb_budget.kommun_kostnader` 
-  WHERE kommun = "1382"
-  '''
-query_job = client.query(query)
-df = query_job.to_dataframe()
+# Read the cost table from the local snapshot, Falkenberg only
+df = read_snapshot('scb_budget.kommun_kostnader')
+df = df[df['kommun'] == '1382']
 
 df = df.merge(verksamhetsomrade, on='verksamhetsomrade', how='left')
-df = df.merge(kommun, on='kommun', how='left')
+# Kommunnamn per kommunkod, slås upp en gång per kod istället för per rad
+df['kommunnamn'] = with_labels(df['kommun'], code_labels('kommun'))
 # st.write(df.head())
 arList = sorted(df['ar'].unique().tolist(), reverse=True)
 ar = st.selectbox('Välj år', arList)
@@ -83,42 +78,18 @@ st.write(fig2)
 
 #-------------------------------- sankey chart data restructuring and plotting ---------------------- #
 
-# define latest year
-latest_ar = df['ar'].max()
-# filter df for latest year
-df_year = df[df['ar']==latest_ar]
-
-
-# Defining labels including the total cost as 'All Costs'
-labels = ['Totala kostnader'] + df_year['aggregerad_niva'].unique().tolist() + df_year['verksamhetsomrade_namn'].unique().tolist()
-
-sources = []
-targets = []
-values = []
-
-# Adding flows from 'All Costs' to each 'aggregerad_niva'
-for niva in df_year['aggregerad_niva'].unique():
-    sources.append(0)  # 0 is the index of 'All Costs'
-    targets.append(labels.index(niva))
-    values.append(df_year[df_year['aggregerad_niva'] == niva]['bruttokostnad_tkr'].sum())
-
-# Adding flows from each 'aggregerad_niva' to each 'verksamhetsomrade_namn'
-for index, row in df_year.iterrows():
-    sources.append(labels.index(row['aggregerad_niva']))
-    targets.append(labels.index(row['verksamhetsomrade_namn']))
-    values.append(row['bruttokostnad_tkr'])
+# Flows 'Totala kostnader' -> aggregerad_niva -> verksamhetsomrade_namn for every year at once,
+# on a shared node list so the diagram keeps its layout when switching year
+flows = sankey_flows_by(
+    df,
+    by='ar',
+    levels=['aggregerad_niva', 'verksamhetsomrade_namn'],
+    value='bruttokostnad_tkr',
+    root='Totala kostnader',
+)
 
 # Creating the Sankey diagram
-fig_sankey = go.Figure(go.Sankey(
-    node=dict(
-        label=labels,
-    ),
-    link=dict(
-        source=sources,
-        target=targets,
-        value=values
-    )
-))
-
-fig_sankey.update_layout(title_text=f"Sankey diagram för kommunens kostnader år {latest_ar}", font_size=10, height=1000)
+fig_sankey = go.Figure(flows[ar].trace())
+
+fig_sankey.update_layout(title_text=f"Sankey diagram för kommunens kostnader år {ar}", font_size=10, height=1000)
 st.plotly_chart(fig_sankey)
@@ -2,35 +2,14 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import json
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.animation import optimize_animation
+from datalayer.figure_cache import cached_figure
+from datalayer.snapshots import data_version, read_snapshot
 import plotly.graph_objs as go
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
 
-
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
-
-regsos = client.query('SELECT DISTINCT kommunnamn, lannamn, lan, regsonamn, regso FROM `falkenbergcloud.scb_befolkning.dim_regso_deso`').to_dataframe()
-
-# Fetch data from BigQuery into a pandas DataFrame
-query = f'''
-  SELECT 
-  *
-  FROM `falkenbergcloud.scb_budget.kommunala_skulden_investeringar`
-  WHERE region_T_F = 0 AND koncern_T_F = 1
-  '''
-query_job = client.query(query)
-df = query_job.to_dataframe()
-
-
-
-df['skuld_per_capita'], df['investeringar_per_capita'] = df['laneskuld']/df['folkmangd'], df['investeringar']/df['folkmangd']
+# Municipalities at group level with debt and investments per capita, computed in BigQuery
+df = read_snapshot('view.skulder_kommuner')
 
 max_ar = df['ar'].max()
 df_histo = df[df['ar']==max_ar]
@@ -71,18 +50,26 @@ filtered_df['label'] = None
 filtered_df.loc[filtered_df['kommun_region'] == "FALKENBERG", 'label'] = filtered_df['kommun_region']
 filtered_df = filtered_df.sort_values(by='ar')
 
-fig_fbg = px.scatter(filtered_df,
-                 x='skuld_per_capita',
-                 y='investeringar_per_capita',
-                 size=filtered_df['folkmangd'].tolist(),
-                 color='kommun_region',
-                 color_continuous_scale='Agsunset',
-                 animation_frame='ar',
-                 range_x=[0, filtered_df['skuld_per_capita'].max()+10000],
-                 range_y=[0, filtered_df['investeringar_per_capita'].max()-30000],
-                 text='label',  # Use the 'label' column for text
-                 size_max=55)
-fig_fbg.update_traces(marker=dict(opacity=0.8))
+# All municipalities animated per year is the heaviest chart on the page, cache it per data version
+def build_fbg_fig():
+    """Debt vs investments per capita for every municipality, one frame per year."""
+    fig_fbg = px.scatter(filtered_df,
+                     x='skuld_per_capita',
+                     y='investeringar_per_capita',
+                     size=filtered_df['folkmangd'].tolist(),
+                     color='kommun_region',
+                     color_continuous_scale='Agsunset',
+                     animation_frame='ar',
+                     range_x=[0, filtered_df['skuld_per_capita'].max()+10000],
+                     range_y=[0, filtered_df['investeringar_per_capita'].max()-30000],
+                     text='label',  # Use the 'label' column for text
+                     size_max=55)
+    fig_fbg.update_traces(marker=dict(opacity=0.8))
+    # One trace per municipality in every frame, share what does not change between years
+    return optimize_animation(fig_fbg, 'skulder.kommuner')
+
+
+fig_fbg = cached_figure('skulder.kommuner', data_version('view.skulder_kommuner'), build_fbg_fig)
 
 st.subheader('Kommuner efter skuld per invånare (x-axel) samt investeringar per invånare (y-axel), animerat per år')
 st.plotly_chart(fig_fbg)
@@ -1,70 +1,52 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.companies import company_cube
+from datalayer.figure_cache import cached_figure
+from datalayer.sunburst import UNKNOWN, long_tail_sunburst
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
 
-@st.cache_data
-def get_company_data():
-  query = '''
-    SELECT * FROM `falkenbergcloud.dnb_data.dnb_ab_falkenberg`
-  '''
-  df = client.query(query).to_dataframe()
-  return df
+st.title("Företagen i Falkenberg (AB)")
+# Summeringar per år och bransch och topplistor, beräknade en gång per dataversion
+cube = company_cube()
+# st.write(cube.companies.head())
 
+valt_ar = st.selectbox('Välj år', sorted(cube.year_list(), reverse=True))
 
-st.title("Företagen i Falkenberg (AB)")
-df = get_company_data()
-# st.write(df.head())
-
-valt_ar = st.selectbox('Välj år', sorted(df['bokslutsar'].unique().tolist(), reverse=True))
-
-fig = px.sunburst(
-    df[df['bokslutsar']==valt_ar],
-    path=['bokslutsar', 'bransch_grov', 'bransch_fin','foretag'],  # Replace these with the actual columns you want to use in the sunburst chart
-    values='omsattning',
-    color_discrete_sequence=px.colors.sequential.Magma,
-    hover_name=None,
-    hover_data={'omsattning': True}
-)
-fig.update_traces(hovertemplate='Omsättning tkr: %{customdata[0]:,.0f}')
-fig.update_layout(margin = dict(t=0, l=0, r=0, b=0))
+sunburst_path = ['bokslutsar', 'bransch_grov', 'bransch_fin', 'foretag']
+
+# Topp 10 företag per bransch, resten samlas i "Övriga (n st)" så att diagrammet håller sig litet
+def build_sunburst():
+    return long_tail_sunburst(cube.companies_in(valt_ar), sunburst_path, 'omsattning', 'Omsättning tkr',
+                              colorway=px.colors.sequential.Magma)
+
+
+fig = cached_figure('foretag.sunburst_omsattning', cube.version, build_sunburst, params={'ar': valt_ar})
 st.header('Omsättning tkr')
 st.write(fig)
 
+# Alla företag i en bransch ritas först när den väljs
+branscher = cube.rollup[cube.rollup['bokslutsar'] == valt_ar][['bransch_grov', 'bransch_fin']].fillna(UNKNOWN)
+vald_gren = st.selectbox('Visa alla företag i bransch:', [None] + list(branscher.itertuples(index=False, name=None)),
+                         format_func=lambda gren: '-' if gren is None else f'{gren[0]} / {gren[1]}')
+if vald_gren is not None:
+    st.write(long_tail_sunburst(cube.companies_in(valt_ar), sunburst_path, 'omsattning', 'Omsättning tkr',
+                                branch=(valt_ar,) + vald_gren, colorway=px.colors.sequential.Magma))
+
 
 # Bar chart: Total omsättning per year (tkr)
-grouped_df = df.groupby('bokslutsar')['omsattning'].sum().reset_index()
+grouped_df = cube.years
 fig_bar = px.bar(grouped_df, x='bokslutsar', y='omsattning', title="Total Omsättning per År (tkr)")
 st.write(fig_bar)
 
-grouped_df['growth_rate'] = grouped_df['omsattning'].pct_change() * 100  # Calculate growth rate
 # fig_line = go.Figure()
 # fig_line.add_trace(go.Scatter(x=grouped_df['bokslutsar'], y=grouped_df['growth_rate'], mode='lines+markers', name='Growth Rate'))
 # fig_line.update_layout(title='Tillväxt % i omsättning år för år', xaxis_title='Year', yaxis_title='Growth Rate (%)')
 # st.write(fig_line)
 
-# Filter out the rows where 'bransch_grov' is 'Okänd' and include years from 2010 onwards
-filtered_df = df[(df['bransch_grov'] != 'Okänd') & (df['bokslutsar'] >= '2010')]
-
-# Group by 'bokslutsar' and 'bransch_grov', then sum the 'omsattning'
-grouped_by_sector_df = filtered_df.groupby(['bokslutsar', 'bransch_grov'])['omsattning'].sum().reset_index()
-
-# Calculate the growth rate within each sector for each year
-grouped_by_sector_df['growth_rate'] = grouped_by_sector_df.groupby('bransch_grov')['omsattning'].pct_change() + 1
-
-# Calculate the cumulative growth rate within each sector from 2010
-grouped_by_sector_df['cumulative_growth'] = grouped_by_sector_df.groupby('bransch_grov')['growth_rate'].cumprod() - 1
-grouped_by_sector_df['cumulative_growth'] *= 100  # Convert to percentage
+# Omsättning per bransch från 2010, utan 'Okänd', med tillväxt år för år och ackumulerad tillväxt i %
+grouped_by_sector_df = cube.sector_growth
 
 # Line graph using Plotly Express for cumulative growth
 fig_cumulative_growth = px.line(
@@ -83,20 +65,18 @@ st.write(fig_cumulative_growth)
 
 # ------------------------------ för bransch nyckeltal och grafer ----------------------------- #
 st.subheader('Nyckeltal per bransch:')
-bransch = st.selectbox('välj bransch:', df['bransch_grov'].unique().tolist())
-
-bransch_df = filtered_df[filtered_df['bransch_grov']==bransch]
+bransch = st.selectbox('välj bransch:', cube.sector_list())
 
 # Bar chart: Total omsättning per year (tkr)
-grouped_bransch_df = bransch_df.groupby('bokslutsar')['omsattning'].sum().reset_index()
+grouped_bransch_df = grouped_by_sector_df[grouped_by_sector_df['bransch_grov']==bransch]
 fig_bar_bransch = px.bar(grouped_bransch_df, x='bokslutsar', y='omsattning', title=f"Total Omsättning per År (tkr) för {bransch}")
 st.write(fig_bar_bransch)
 
-bransch_df = bransch_df[bransch_df['bokslutsar']==valt_ar]
-antal_bolag_totalt = df[df['bokslutsar']==valt_ar].shape[0]
-antal_bolag_bransch = bransch_df['bransch_grov'].count()
-anställda = bransch_df['anstallda'].sum()
-omsattning = bransch_df['omsattning'].sum()
+bransch_ar = cube.sector_year(valt_ar, bransch)
+antal_bolag_totalt = cube.year_total(valt_ar)['antal_bolag']
+antal_bolag_bransch = bransch_ar['antal_bolag']
+anställda = bransch_ar['anstallda']
+omsattning = bransch_ar['omsattning']
 
 st.subheader('Snabbfakta:')
 st.write(f'Antal företag (aktiebolag) år {valt_ar} är {antal_bolag_totalt:,.0f} stycken')
@@ -109,13 +89,13 @@ st.write(f'Omsättning för bolag inom {bransch}: {omsattning:,.0f} KSEK')
 # ------------------------------ Top 10 Companies in Each "bransch_grov" ----------------------------- #
 # Add a section to display top 10 companies for selected 'bransch_grov' by revenue and employees
 st.subheader(f'Top 10 företag i vald bransch år {valt_ar}:')
-# selected_bransch = st.selectbox('Välj bransch för att visa topp 10 företag:', df['bransch_grov'].unique().tolist())
+# selected_bransch = st.selectbox('Välj bransch för att visa topp 10 företag:', cube.sector_list())
 
-# Filter out data for selected bransch and year, then sort by omsattning and get top 10
-top_10_omsattning = df[(df['bransch_grov'] == bransch) & (df['bokslutsar'] == valt_ar)].nlargest(10, 'omsattning')
+# Top 10 for selected bransch and year by omsattning, looked up in the precomputed index
+top_10_omsattning = cube.top('omsattning', valt_ar, bransch)
 
 fig_omsattning = px.bar(
-    top_10_omsattning.sort_values('omsattning', ascending=False), 
+    top_10_omsattning, 
     x='foretag', 
     y='omsattning',
     text='omsattning',
@@ -125,11 +105,11 @@ fig_omsattning = px.bar(
 
 fig_omsattning.update_traces(texttemplate='%{text:,.0f}', textposition='inside')  # Positioning text inside the bars
 
-# Filter out data for selected bransch and year, then sort by omsattning and get top 10
-top_10_anstallda = df[(df['bransch_grov'] == bransch) & (df['bokslutsar'] == valt_ar)].nlargest(10, 'anstallda')
+# Top 10 for selected bransch and year by anstallda
+top_10_anstallda = cube.top('anstallda', valt_ar, bransch)
 
 fig_anstallda = px.bar(
-    top_10_omsattning.sort_values('anstallda', ascending=False), 
+    top_10_anstallda, 
     x='foretag', 
     y='anstallda',
     text='anstallda',
@@ -145,19 +125,9 @@ st.write(fig_omsattning)
 
 st.write(fig_anstallda)
 
-# Rename to avoid conflicts with other filtered_df
-sector_filtered_df = df[~df['bransch_grov'].isin(['Okänd', 'Finans och fastighetsverksamhet'])]
-# sector_filtered_df = df[df['bransch_grov'] != 'Okänd']
-most_recent_year = sector_filtered_df['bokslutsar'].max()
-sector_filtered_df = sector_filtered_df[~((sector_filtered_df['bokslutsar'] == most_recent_year) & (sector_filtered_df['anstallda'] == 0))]
-
-# Group by 'bransch_grov' and 'bokslutsar', sum 'omsattning', 'totalt_kapital', and 'anstallda'
-sector_yearly_summary = sector_filtered_df.groupby(['bransch_grov', 'bokslutsar']).agg({'omsattning': 'sum', 'totalt_kapital': 'sum', 'anstallda': 'sum', 'eget_kapital': 'sum'}).reset_index()
-
-# Calculate 'omsattning_per_anstalld' and 'totalt_kapital_per_anstalld'
-sector_yearly_summary['omsattning_per_anstalld'] = sector_yearly_summary['omsattning'] / sector_yearly_summary['anstallda']
-sector_yearly_summary['totalt_kapital_per_anstalld'] = sector_yearly_summary['totalt_kapital'] / sector_yearly_summary['anstallda']
-sector_yearly_summary['eget_kapital_per_anstalld'] =sector_yearly_summary['eget_kapital'] / sector_yearly_summary['anstallda']
+# Summed per 'bransch_grov' and 'bokslutsar' with omsattning, totalt_kapital and eget_kapital per anstalld,
+# without 'Okänd' and 'Finans och fastighetsverksamhet' and the most recent year's companies without employees
+sector_yearly_summary = cube.per_employee
 
 # Convert 'omsattning_per_anstalld' to a list for the 'size' argument in scatter plot
 size_values = sector_yearly_summary['omsattning_per_anstalld'].tolist()
@@ -174,33 +144,45 @@ fig_avg_rev_per_emp = px.line(
 st.write(fig_avg_rev_per_emp)
 
 # Scatter plot for capital per employee vs revenue per employee
-fig_scatter = px.scatter(
-    sector_yearly_summary,
-    x='totalt_kapital_per_anstalld',
-    y='omsattning_per_anstalld',
-    animation_frame='bokslutsar',
-    color='bransch_grov',
-    size=size_values,
-    range_x=[0, sector_yearly_summary['totalt_kapital_per_anstalld'].max()+1000],
-    range_y=[0, sector_yearly_summary['omsattning_per_anstalld'].max()+1000],
-
-    title='Totalt Kapital per Anställd vs Omsättning per Anställd per Bransch och År',
-    labels={'totalt_kapital_per_anstalld': 'Totalt Kapital per Anställd', 'omsattning_per_anstalld': 'Omsättning per Anställd'}
-)
+def build_scatter():
+    """Capital vs revenue per employee per sector, one frame per year."""
+    fig_scatter = px.scatter(
+        sector_yearly_summary,
+        x='totalt_kapital_per_anstalld',
+        y='omsattning_per_anstalld',
+        animation_frame='bokslutsar',
+        color='bransch_grov',
+        size=size_values,
+        range_x=[0, sector_yearly_summary['totalt_kapital_per_anstalld'].max()+1000],
+        range_y=[0, sector_yearly_summary['omsattning_per_anstalld'].max()+1000],
+
+        title='Totalt Kapital per Anställd vs Omsättning per Anställd per Bransch och År',
+        labels={'totalt_kapital_per_anstalld': 'Totalt Kapital per Anställd', 'omsattning_per_anstalld': 'Omsättning per Anställd'}
+    )
+    return fig_scatter
+
+
+fig_scatter = cached_figure('foretag.kapital_omsattning', cube.version, build_scatter)
 st.write(fig_scatter)
 
 # Scatter plot for capital per employee vs revenue per employee
-fig_scatter2 = px.scatter(
-    sector_yearly_summary,
-    x='totalt_kapital_per_anstalld',
-    y='eget_kapital_per_anstalld',
-    animation_frame='bokslutsar',
-    color='bransch_grov',
-    size=size_values,
-    range_x=[0, sector_yearly_summary['totalt_kapital_per_anstalld'].max()+1000],
-    range_y=[0, sector_yearly_summary['eget_kapital_per_anstalld'].max()+1000],
-
-    title='Totalt Kapital per Anställd vs Omsättning per Anställd per Bransch och År',
-    labels={'totalt_kapital_per_anstalld': 'Totalt Kapital per Anställd', 'omsattning_per_anstalld': 'Omsättning per Anställd', 'eget_kapital_per_anstalld': 'Egetkapital per anställd'}
-)
+def build_scatter2():
+    """Capital vs equity per employee per sector, one frame per year."""
+    fig_scatter2 = px.scatter(
+        sector_yearly_summary,
+        x='totalt_kapital_per_anstalld',
+        y='eget_kapital_per_anstalld',
+        animation_frame='bokslutsar',
+        color='bransch_grov',
+        size=size_values,
+        range_x=[0, sector_yearly_summary['totalt_kapital_per_anstalld'].max()+1000],
+        range_y=[0, sector_yearly_summary['eget_kapital_per_anstalld'].max()+1000],
+
+        title='Totalt Kapital per Anställd vs Omsättning per Anställd per Bransch och År',
+        labels={'totalt_kapital_per_anstalld': 'Totalt Kapital per Anställd', 'omsattning_per_anstalld': 'Omsättning per Anställd', 'eget_kapital_per_anstalld': 'Egetkapital per anställd'}
+    )
+    return fig_scatter2
+
+
+fig_scatter2 = cached_figure('foretag.kapital_eget_kapital', cube.version, build_scatter2)
 st.write(fig_scatter2)
\ No newline at end of file
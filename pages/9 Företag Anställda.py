@@ -1,50 +1,42 @@
 import streamlit as st
-from google.cloud import bigquery
-from google.oauth2 import service_account
+from datalayer.companies import company_cube
+from datalayer.figure_cache import cached_figure
+from datalayer.sunburst import UNKNOWN, long_tail_sunburst
 import pandas as pd
 import plotly.express as px
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
-
-# Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
-
-@st.cache_data
-def get_company_data():
-    query = '''
-    SELECT * FROM `falkenbergcloud.dnb_data.dnb_ab_falkenberg`
-    '''
-    df = client.query(query).to_dataframe()
-    return df
 
 st.title("Företagen i Falkenberg (AB)")
 
-df = get_company_data()
+# Samma förberäknade kub som sidan 8 använder
+cube = company_cube()
 
-valt_ar = st.selectbox('Välj år', sorted(df['bokslutsar'].unique().tolist(), reverse=True))
+valt_ar = st.selectbox('Välj år', sorted(cube.year_list(), reverse=True))
 
 # First chart: Sunburst chart
-fig_anstallda = px.sunburst(
-    df[df['bokslutsar']==valt_ar],
-    path=['bokslutsar', 'bransch_grov', 'bransch_fin','foretag'],
-    values='anstallda',
-    title='Antal Anställda',
-    color_discrete_sequence=px.colors.sequential.Agsunset,
-    hover_name=None,
-    hover_data={'anstallda': True}
-)
-fig_anstallda.update_traces(hovertemplate='Antal Anställda: %{customdata[0]:,.0f}')
-fig_anstallda.update_layout(margin = dict(t=0, l=0, r=0, b=0))
+sunburst_path = ['bokslutsar', 'bransch_grov', 'bransch_fin', 'foretag']
+
+# Topp 10 företag per bransch, resten samlas i "Övriga (n st)"
+def build_sunburst():
+    return long_tail_sunburst(cube.companies_in(valt_ar), sunburst_path, 'anstallda', 'Antal Anställda',
+                              colorway=px.colors.sequential.Agsunset)
+
+
+fig_anstallda = cached_figure('foretag.sunburst_anstallda', cube.version, build_sunburst, params={'ar': valt_ar})
 
 st.header('Antal anställda')
 st.plotly_chart(fig_anstallda)
 
+# Alla företag i en bransch ritas först när den väljs
+branscher = cube.rollup[cube.rollup['bokslutsar'] == valt_ar][['bransch_grov', 'bransch_fin']].fillna(UNKNOWN)
+vald_gren = st.selectbox('Visa alla företag i bransch:', [None] + list(branscher.itertuples(index=False, name=None)),
+                         format_func=lambda gren: '-' if gren is None else f'{gren[0]} / {gren[1]}')
+if vald_gren is not None:
+    st.plotly_chart(long_tail_sunburst(cube.companies_in(valt_ar), sunburst_path, 'anstallda', 'Antal Anställda',
+                                       branch=(valt_ar,) + vald_gren, colorway=px.colors.sequential.Agsunset))
+
 # Second chart: Column chart for top 10 companies by number of employees
-top_10_companies = df[df['bokslutsar']==valt_ar].nlargest(10, 'anstallda')
+top_10_companies = cube.top('anstallda', valt_ar).copy()
 top_10_companies['company_with_industry'] = top_10_companies['foretag'] + ' (' + top_10_companies['bransch_grov'] + ')'
 
 fig_top_10 = px.bar(
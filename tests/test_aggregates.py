@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from datalayer import aggregates, snapshots
+
+SOURCE = 'scb_befolkning.folkmangd_falkenberg'
+AGGREGATE = 'agg.folkmangd_aldersgrupp'
+
+
+@pytest.fixture
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_DIR', tmp_path)
+    monkeypatch.setattr(snapshots, 'MANIFEST_FILE', tmp_path / 'manifest.json')
+    monkeypatch.setattr(snapshots, 'OFFLINE', False)
+    monkeypatch.setattr(aggregates, 'OFFLINE', False)
+    return tmp_path
+
+
+def _population() -> pd.DataFrame:
+    return pd.DataFrame({'alder': ['0', '15', '42', '100+'], 'ar': [2023] * 4, 'folkmangd': [10, 20, 30, 1]})
+
+
+def test_age_groups():
+    groups = aggregates.age_groups(_population())
+    assert groups['Åldersgrupper'].tolist() == ['0-9 år', '10-19 år', '40-49 år', '100+ år']
+    assert groups['Befolkningsmängd'].sum() == 61
+
+
+def test_unreachable_bigquery_keeps_the_previous_aggregate(snapshot_dir, monkeypatch):
+    snapshots.write_snapshot(SOURCE, _population())
+    aggregates.read_aggregate(AGGREGATE)
+
+    # The source is past its max age and BigQuery is down
+    manifest = snapshots.read_manifest()
+    manifest[SOURCE]['fetched_at'] -= 365 * 24 * 60 * 60
+    snapshots._write_manifest(manifest)
+    calls = []
+
+    def unreachable(sql, params=None):
+        calls.append(sql)
+        raise ConnectionError('BigQuery is down')
+
+    monkeypatch.setattr(snapshots, 'run_query', unreachable)
+
+    for _ in range(3):
+        assert aggregates.read_aggregate(AGGREGATE)['Befolkningsmängd'].sum() == 61
+    assert len(calls) == 1
+    assert not snapshots.is_stale(SOURCE, snapshots.read_manifest()[SOURCE])
@@ -0,0 +1,37 @@
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from datalayer.animation import optimize_animation
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'ar': [2020, 2020, 2021, 2021, 2022, 2022],
+        'kommun': ['Falkenberg', 'Varberg'] * 3,
+        'varde': [1.5, 2.5, 1.75, 2.25, 2.0, 3.0],
+        'folkmangd': [46000, 65000, 46500, 66000, 47000, 67000],
+    })
+
+
+def _assert_valid(fig: go.Figure, original: go.Figure) -> None:
+    # Validating again raises if a typed array was taken apart
+    validated = go.Figure(fig.to_dict())
+    assert len(validated.frames) == len(original.frames)
+    assert validated.data[0].type == original.data[0].type
+
+
+def test_bar_animation_keeps_typed_arrays():
+    fig = px.bar(_frame(), x='kommun', y='varde', text='varde', animation_frame='ar')
+    optimized = optimize_animation(fig, 'test.bar')
+    _assert_valid(optimized, fig)
+    for frame in optimized.frames:
+        assert frame.data[0].y is not None
+
+
+def test_scatter_animation_keeps_typed_arrays():
+    fig = px.scatter(_frame(), x='folkmangd', y='varde', color='kommun', size='folkmangd', animation_frame='ar')
+    optimized = optimize_animation(fig, 'test.scatter')
+    _assert_valid(optimized, fig)
+    for frame in optimized.frames:
+        assert frame.data[0].x is not None
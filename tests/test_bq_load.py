@@ -0,0 +1,80 @@
+import pyarrow as pa
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+from datalayer import bq_load
+
+SCHEMA = [bigquery.SchemaField('regso', 'STRING'), bigquery.SchemaField('ar', 'INTEGER')]
+ROWS = pa.table({'regso': ['1382R001'], 'ar': [2023]})
+
+
+class FakeClient:
+    project = 'falkenbergcloud'
+
+    def __init__(self, table=None):
+        self.table = table
+        self.deleted = []
+
+    def get_table(self, table_id):
+        if self.table is None:
+            raise NotFound(table_id)
+        return self.table
+
+    def delete_table(self, table_id, not_found_ok=False):
+        self.deleted.append(table_id)
+
+
+def test_merge_into_a_missing_table_loads_it(monkeypatch):
+    loads = []
+    monkeypatch.setattr(bq_load, 'get_client', lambda: FakeClient())
+    monkeypatch.setattr(bq_load, 'load_arrow', lambda table_id, *args: loads.append(table_id) or 'load job')
+    assert bq_load.merge_arrow('scb_befolkning.regso_socio_halland', ROWS, SCHEMA, ['regso', 'ar']) == 'load job'
+    assert loads == ['falkenbergcloud.scb_befolkning.regso_socio_halland']
+
+
+def test_failed_staging_load_drops_the_staging_table(monkeypatch):
+    client = FakeClient(bigquery.Table('falkenbergcloud.scb_befolkning.regso_socio_halland', schema=SCHEMA))
+    monkeypatch.setattr(bq_load, 'get_client', lambda: client)
+
+    def fail(table_id, *args):
+        raise RuntimeError('load failed')
+
+    monkeypatch.setattr(bq_load, 'load_arrow', fail)
+    with pytest.raises(RuntimeError):
+        bq_load.merge_arrow('scb_befolkning.regso_socio_halland', ROWS, SCHEMA, ['regso', 'ar'])
+    assert len(client.deleted) == 1
+    assert client.deleted[0].startswith('falkenbergcloud.scb_befolkning.regso_socio_halland_staging_')
+
+
+def test_merge_into_an_unmigrated_table_fails_early(monkeypatch):
+    unmigrated = [bigquery.SchemaField('regso', 'STRING'), bigquery.SchemaField('ar', 'STRING')]
+    client = FakeClient(bigquery.Table('falkenbergcloud.scb_befolkning.regso_socio_halland', schema=unmigrated))
+    monkeypatch.setattr(bq_load, 'get_client', lambda: client)
+    with pytest.raises(ValueError, match='migrate scb_befolkning.regso_socio_halland'):
+        bq_load.merge_arrow('scb_befolkning.regso_socio_halland', ROWS, SCHEMA, ['regso', 'ar'])
+    assert client.deleted == []
+
+
+def test_merge_sql_updates_changed_rows_and_inserts_new_ones():
+    sql = bq_load.merge_sql('p.d.t', 'p.d.t_staging', ['regso', 'ar', 'folkmangd'], ['regso', 'ar'])
+    assert sql.splitlines() == [
+        'MERGE `p.d.t` T',
+        'USING `p.d.t_staging` S',
+        'ON T.`regso` = S.`regso` AND T.`ar` = S.`ar`',
+        'WHEN MATCHED AND (T.`folkmangd` IS DISTINCT FROM S.`folkmangd`) THEN UPDATE SET `folkmangd` = S.`folkmangd`',
+        'WHEN NOT MATCHED THEN INSERT (`regso`, `ar`, `folkmangd`) VALUES (S.`regso`, S.`ar`, S.`folkmangd`)',
+    ]
+
+
+def test_merge_sql_with_only_keys_only_inserts():
+    sql = bq_load.merge_sql('p.d.t', 'p.d.s', ['regso', 'ar'], ['regso', 'ar'])
+    assert 'WHEN MATCHED' not in sql
+    assert 'WHEN NOT MATCHED THEN INSERT' in sql
+
+
+def test_schema_mismatches():
+    target = [bigquery.SchemaField('regso', 'STRING'), bigquery.SchemaField('ar', 'STRING'), bigquery.SchemaField('v', 'INTEGER')]
+    schema = [bigquery.SchemaField('regso', 'STRING'), bigquery.SchemaField('ar', 'INT64'), bigquery.SchemaField('v', 'INT64'), bigquery.SchemaField('x', 'FLOAT')]
+    assert bq_load.schema_mismatches(target, schema) == ['ar: STRING != INT64', 'x: missing']
+    assert bq_load.schema_mismatches(schema, schema) == []
@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datalayer.companies import RankingIndex, build_cube
+
+
+def _companies(n: int = 60, seed: int = 1) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    years = np.repeat([2021, 2022], n)
+    frame = pd.DataFrame({
+        'bokslutsar': years,
+        'org_nummer': [f'55{i:08d}' for i in range(n)] * 2,
+        'foretag': [f'Bolag {i} AB' for i in range(n)] * 2,
+        'bransch_grov': rng.choice(['Handel', 'Industri', 'Bygg'], 2 * n),
+        'bransch_fin': rng.choice(['A', 'B'], 2 * n),
+        # Few distinct values, so there are ties
+        'omsattning': rng.integers(0, 8, 2 * n).astype(float) * 1000,
+        'anstallda': rng.integers(0, 20, 2 * n),
+        'arbetstallen': 1,
+        'resultat': rng.normal(0, 100, 2 * n),
+        'rorelsemarginal': rng.normal(5, 2, 2 * n),
+        'totalt_kapital': rng.integers(1, 50, 2 * n).astype(float) * 100,
+        'eget_kapital': rng.integers(1, 20, 2 * n).astype(float) * 100,
+        'soliditet': rng.normal(30, 10, 2 * n),
+    })
+    frame.loc[::7, 'omsattning'] = np.nan
+    return frame
+
+
+@pytest.fixture(scope='module')
+def companies():
+    return _companies()
+
+
+@pytest.mark.parametrize('metric', ['omsattning', 'anstallda', 'resultat'])
+@pytest.mark.parametrize('sector', [None, 'Handel'])
+def test_top_matches_nlargest(companies, metric, sector):
+    index = RankingIndex(companies)
+    selected = companies[companies['bokslutsar'] == 2022]
+    if sector is not None:
+        selected = selected[selected['bransch_grov'] == sector]
+    # Companies without a value are not ranked
+    selected = selected[selected[metric].notna()]
+    for n in (1, 5, 100):
+        expected = selected.nlargest(n, metric)
+        assert index.top(metric, 2022, sector, n).index.tolist() == expected.index.tolist()
+    assert index.count(metric, 2022, sector) == len(selected)
+
+
+def test_rank_shares_the_best_rank_on_ties(companies):
+    index = RankingIndex(companies)
+    year = companies[companies['bokslutsar'] == 2021]
+    for _, row in year.iterrows():
+        rank = index.rank(row['org_nummer'], 'omsattning', 2021)
+        if pd.isna(row['omsattning']):
+            assert rank is None
+        else:
+            assert rank == (year['omsattning'] > row['omsattning']).sum() + 1
+
+
+def test_rank_outside_the_sector_or_year_is_none(companies):
+    index = RankingIndex(companies)
+    row = companies.iloc[1]
+    other = next(sector for sector in ('Handel', 'Industri', 'Bygg') if sector != row['bransch_grov'])
+    assert index.rank(row['org_nummer'], 'anstallda', int(row['bokslutsar']), other) is None
+    assert index.rank(row['org_nummer'], 'anstallda', 1990) is None
+
+
+def test_cube_rollups_match_a_direct_groupby(companies):
+    cube = build_cube(companies, 'v1')
+    expected = companies.groupby(['bokslutsar', 'bransch_grov'])['omsattning'].sum()
+    sectors = cube.sectors.set_index(['bokslutsar', 'bransch_grov'])['omsattning']
+    pd.testing.assert_series_equal(sectors.sort_index(), expected.sort_index(), check_names=False)
+
+    year = cube.year_total(2022)
+    assert year['antal_bolag'] == (companies['bokslutsar'] == 2022).sum()
+    assert year['anstallda'] == companies.loc[companies['bokslutsar'] == 2022, 'anstallda'].sum()
+    expected_growth = (year['omsattning'] / cube.year_total(2021)['omsattning'] - 1) * 100
+    assert year['growth_rate'] == pytest.approx(expected_growth)
+
+
+def test_cube_lookups(companies):
+    cube = build_cube(companies, 'v1')
+    assert cube.year_list() == [2021, 2022]
+    assert len(cube.companies_in(2021)) == (companies['bokslutsar'] == 2021).sum()
+    assert cube.sector_year(2022, 'Saknas')['antal_bolag'] == 0
+    handel = companies[(companies['bokslutsar'] == 2022) & (companies['bransch_grov'] == 'Handel')]
+    assert cube.sector_year(2022, 'Handel')['antal_bolag'] == len(handel)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from datalayer.encoding import KON_LABELS, encode, with_labels
+
+
+def test_encode_years_and_codes():
+    frame = encode(pd.DataFrame({
+        'ar': ['2021', '2022'],
+        'bokslutsar': ['2020', None],
+        'regso': ['1382R001', '1382R001'],
+        'folkmangd': [1, 2],
+    }))
+    assert str(frame['ar'].dtype) == 'int16'
+    assert str(frame['bokslutsar'].dtype) == 'Int16'
+    assert frame['bokslutsar'].isna().tolist() == [False, True]
+    assert isinstance(frame['regso'].dtype, pd.CategoricalDtype)
+    assert frame['folkmangd'].dtype == 'int64'
+
+
+def test_with_labels_maps_each_category_once():
+    codes = pd.Series(['2', '1', '2', '3'], index=[5, 6, 7, 8])
+    labels = with_labels(codes, KON_LABELS)
+    assert labels.tolist() == ['kvinna', 'man', 'kvinna', '3']
+    assert labels.index.tolist() == [5, 6, 7, 8]
+    assert list(labels.cat.categories) == ['man', 'kvinna', '3']
+
+
+def test_with_labels_keeps_unused_categories_of_a_categorical():
+    codes = pd.Series(['1', '1'], dtype=pd.CategoricalDtype(['1', '2']))
+    assert list(with_labels(codes, KON_LABELS).cat.categories) == ['man', 'kvinna']
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datalayer.growth import cagr_to_reference, cumulative_growth, year_over_year
+
+
+def _frame() -> pd.DataFrame:
+    # Shuffled, with string years and a group missing its first year
+    return pd.DataFrame({
+        'ar': ['2022', '2020', '2021', '2022', '2021', '2020'],
+        'kommun': ['Falkenberg', 'Falkenberg', 'Falkenberg', 'Varberg', 'Varberg', 'Halmstad'],
+        'folkmangd': [121.0, 100.0, 110.0, 60.0, 50.0, 80.0],
+    }, index=[10, 11, 12, 13, 14, 15])
+
+
+def _loop_cagr(df: pd.DataFrame) -> dict:
+    expected = {}
+    for label, row in df.iterrows():
+        end = df[(df['kommun'] == row['kommun']) & (df['ar'] == '2022')]['folkmangd']
+        years = 2022 - int(row['ar'])
+        if end.empty:
+            expected[label] = np.nan
+        else:
+            expected[label] = 0.0 if years == 0 else (end.iloc[0] / row['folkmangd']) ** (1 / years) - 1
+    return expected
+
+
+def test_cagr_matches_the_per_row_formula():
+    df = _frame()
+    result = cagr_to_reference(df, 'ar', 'kommun', 'folkmangd')
+    assert result.index.equals(df.index)
+    expected = _loop_cagr(df)
+    for label in df.index:
+        assert result[label] == pytest.approx(expected[label], nan_ok=True)
+    assert result[11] == pytest.approx(0.1)
+
+
+def test_cagr_to_an_earlier_reference_year():
+    result = cagr_to_reference(_frame(), 'ar', 'kommun', 'folkmangd', reference=2021)
+    assert result[11] == pytest.approx(0.1)
+    assert result[12] == 0.0
+
+
+def test_year_over_year():
+    result = year_over_year(_frame(), 'ar', 'kommun', 'folkmangd')
+    assert np.isnan(result[11])
+    assert result[12] == pytest.approx(0.1)
+    assert result[10] == pytest.approx(0.1)
+    assert result[13] == pytest.approx(0.2)
+
+
+def test_cumulative_growth_starts_at_each_groups_first_year():
+    result = cumulative_growth(_frame(), 'ar', 'kommun', 'folkmangd')
+    assert result[11] == 0.0
+    assert result[10] == pytest.approx(0.21)
+    assert result[14] == 0.0
+    assert result[13] == pytest.approx(0.2)
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+import requests
+
+from datalayer import http_cache, http_client
+
+URL = 'https://api.scb.se/OV0104/v1/doris/sv/ssd/EN/EN0203/EN0203A/SlutAnvSektor'
+PAYLOAD = {'query': [], 'response': {'format': 'json'}}
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, 'CACHE_DIR', tmp_path)
+    monkeypatch.setattr(http_cache, '_memo', {})
+    return tmp_path
+
+
+def test_failed_refresh_serves_the_stale_copy_until_retry_after(cache_dir, monkeypatch):
+    http_cache._write(http_cache.request_key(URL, PAYLOAD), {'url': URL, 'fetched_at': 0, 'updated': None}, '{"data": [1]}')
+    calls = []
+
+    def unreachable(*args, **kwargs):
+        calls.append(args)
+        raise requests.ConnectionError('SCB is down')
+
+    monkeypatch.setattr(http_client, 'get_json', unreachable)
+    monkeypatch.setattr(http_client, 'request', unreachable)
+
+    assert http_cache.cached_post_json(URL, PAYLOAD) == {'data': [1]}
+    assert len(calls) == 2
+    assert http_cache.cached_post_json(URL, PAYLOAD) == {'data': [1]}
+    assert len(calls) == 2
+
+    later = time.time() + http_cache.RETRY_AFTER + 1
+    monkeypatch.setattr(time, 'time', lambda: later)
+    http_cache.cached_post_json(URL, PAYLOAD)
+    assert len(calls) == 4
@@ -0,0 +1,104 @@
+import pytest
+
+from datalayer.pxweb import cell_count, chunk_query, item_selection, parse, years_to_refresh
+from datalayer.pxweb_tables import TABLES
+
+SOCIO = TABLES['scb_befolkning.regso_socio_halland']
+
+COLUMNS = [
+    {'code': 'Region', 'text': 'region', 'type': 'd'},
+    {'code': 'Tid', 'text': 'år', 'type': 't'},
+] + [{'code': f'C{i}', 'text': f'c{i}', 'type': 'c'} for i in range(5)]
+
+
+def test_parse_empty_response():
+    table = parse(SOCIO, {'columns': COLUMNS, 'data': []})
+    assert table.num_rows == 0
+    assert table.column_names == [column.name for column in SOCIO.columns]
+
+
+def test_parse_types_columns_and_nulls_missing_values():
+    data = {
+        'columns': COLUMNS,
+        'data': [
+            {'key': ['1382R001', '2022'], 'values': ['0.5', '3', '12.5', '..', '4.0']},
+            {'key': ['1382R002', '2022'], 'values': ['-1.2', '1', '20.0', '8.5', '-']},
+        ],
+    }
+    table = parse(SOCIO, data)
+    assert table.column('regso').to_pylist() == ['1382R001', '1382R002']
+    assert table.column('ar').to_pylist() == [2022, 2022]
+    assert table.column('socio_ek_index').to_pylist() == [0.5, -1.2]
+    assert table.column('andel_lag_ekonomisk_standard').to_pylist() == [None, 8.5]
+    assert table.column('andel_ek_bistand_eller_langtidsarbetslos').to_pylist() == [4.0, None]
+
+
+def test_parse_applies_the_row_predicate():
+    spec = TABLES['scb_befolkning.regso_transfereringar_halland']
+    data = {
+        'columns': [
+            {'code': 'Region', 'type': 'd'},
+            {'code': 'Kon', 'type': 'd'},
+            {'code': 'Bakgrund', 'type': 'd'},
+            {'code': 'Tid', 'type': 't'},
+            {'code': '000004WR', 'type': 'c'},
+        ],
+        'data': [
+            {'key': ['1382R001', '1+2', 'tot20-64', '2021'], 'values': ['6.1']},
+            {'key': ['1382R002', '1+2', 'tot20-64', '2021'], 'values': ['0']},
+            {'key': ['1382R003', '1+2', 'tot20-64', '2021'], 'values': ['..']},
+        ],
+    }
+    assert parse(spec, data).column('regso').to_pylist() == ['1382R001']
+
+
+def _query(regions: int, years: int) -> list[dict]:
+    return [
+        item_selection('Region', [f'R{i:03d}' for i in range(regions)]),
+        item_selection('Kon', ['1', '2']),
+        item_selection('Tid', [str(2000 + i) for i in range(years)]),
+    ]
+
+
+def test_cell_count_multiplies_the_selections():
+    assert cell_count(_query(95, 10)) == 95 * 2 * 10
+
+
+def test_small_query_is_one_chunk():
+    query = _query(10, 5)
+    assert chunk_query(query, max_cells=100) == [query]
+
+
+def test_chunks_stay_under_the_limit_and_cover_every_cell():
+    query = _query(95, 10)
+    chunks = chunk_query(query, max_cells=300)
+    assert all(cell_count(chunk) <= 300 for chunk in chunks)
+    cells = {
+        (region, kon, year)
+        for chunk in chunks
+        for region in chunk[0]['selection']['values']
+        for kon in chunk[1]['selection']['values']
+        for year in chunk[2]['selection']['values']
+    }
+    assert len(cells) == cell_count(query)
+    assert sum(cell_count(chunk) for chunk in chunks) == cell_count(query)
+
+
+def test_aggregated_selections_are_not_split():
+    query = [item_selection('Region', [f'R{i}' for i in range(50)], filter='agg:RegSO'), item_selection('Tid', ['2020', '2021'])]
+    chunks = chunk_query(query, max_cells=50)
+    assert [chunk[1]['selection']['values'] for chunk in chunks] == [['2020'], ['2021']]
+    assert all(chunk[0] == query[0] for chunk in chunks)
+
+
+def test_unsplittable_query_raises():
+    with pytest.raises(ValueError):
+        chunk_query([item_selection('Region', ['R1', 'R2'], filter='agg:RegSO'), item_selection('Tid', ['2020'])], max_cells=1)
+
+
+def test_years_to_refresh_adds_new_years_and_revises_the_latest():
+    available = ['2019', '2020', '2021', '2022']
+    assert years_to_refresh(available, [2019, 2020]) == ['2020', '2021', '2022']
+    assert years_to_refresh(available, ['2019', '2020', '2021', '2022'], revise_latest=2) == ['2021', '2022']
+    assert years_to_refresh(available, [], revise_latest=1) == available
+    assert years_to_refresh(available, available, revise_latest=0) == []
@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+
+from datalayer.queries import REGSOS, VIEWS, integer_years
+from datalayer.query_builder import Select, eq, isin, literal
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, 'NULL'),
+    (True, 'TRUE'),
+    (0, '0'),
+    (1.5, '1.5'),
+    (datetime.date(2023, 1, 31), "DATE '2023-01-31'"),
+    ('Falkenberg', "'Falkenberg'"),
+    ("Ängelholm's", "'Ängelholm\\'s'"),
+    ('a\\b', "'a\\\\b'"),
+])
+def test_literal(value, expected):
+    assert literal(value) == expected
+
+
+def test_conditions():
+    assert eq('k.region_T_F', 0) == 'k.region_T_F = 0'
+    assert isin('r.kommun', ['1382', '1383']) == "r.kommun IN ('1382', '1383')"
+
+
+def test_select_with_join_filter_and_group():
+    query = (
+        Select('scb_befolkning.regso_folkmangd_halland', 'f')
+        .select('f.regso', 'SUM(f.folkmangd) AS folkmangd')
+        .join(REGSOS, 'r', on=('regso',), how='left')
+        .where(eq('r.kommunnamn', 'Falkenberg'))
+        .group_by('f.regso')
+    )
+    assert query.sql().splitlines() == [
+        'SELECT f.regso, SUM(f.folkmangd) AS folkmangd',
+        'FROM `falkenbergcloud.scb_befolkning.regso_folkmangd_halland` AS f',
+        'LEFT JOIN (SELECT DISTINCT d.regso, d.regsonamn, d.kommunnamn',
+        'FROM `falkenbergcloud.scb_befolkning.dim_regso_deso` AS d) AS r USING (regso)',
+        "WHERE (r.kommunnamn = 'Falkenberg')",
+        'GROUP BY f.regso',
+    ]
+
+
+def test_select_without_columns_raises():
+    with pytest.raises(ValueError):
+        Select('scb_befolkning.dim_regso_deso', 'd').sql()
+
+
+def test_integer_years_casts_the_year_column():
+    sql = Select(integer_years('scb_budget.kommun_kostnader'), 'k').select('k.ar').sql()
+    assert 'SELECT * REPLACE (SAFE_CAST(y.ar AS INT64) AS ar)' in sql
+
+
+def test_views_name_their_columns_and_read_integer_years():
+    for name, sql in VIEWS.items():
+        outer = sql.splitlines()[0]
+        assert outer.startswith('SELECT ') and '*' not in outer, name
+        assert 'SAFE_CAST(y.ar AS INT64)' in sql, name
+        assert sql.count('(') == sql.count(')'), name
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from datalayer import query_cache
+from datalayer.query_cache import DEFAULT_TTL, TABLE_TTL, QueryCache, cache_key, referenced_tables, ttl_for
+
+SQL = """
+    SELECT DISTINCT `bokslutsar` AS value
+    FROM `falkenbergcloud.dnb_data.dnb_ab_falkenberg`
+"""
+
+
+def test_cache_key_ignores_formatting_but_not_parameters():
+    assert cache_key(SQL) == cache_key(' '.join(SQL.split()))
+    assert cache_key(SQL, {'ar': 2020}) != cache_key(SQL, {'ar': 2021})
+
+
+def test_ttl_is_the_shortest_of_the_referenced_tables():
+    tables = referenced_tables(SQL + " JOIN `scb_befolkning.dim_regso_deso` USING (regso)")
+    assert tables == {'dnb_data.dnb_ab_falkenberg', 'scb_befolkning.dim_regso_deso'}
+    assert ttl_for(tables) == TABLE_TTL['dnb_data.dnb_ab_falkenberg']
+    assert ttl_for([]) == DEFAULT_TTL
+
+
+def test_cached_query_is_invalidated_by_a_load(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_cache, 'CACHE_DIR', tmp_path)
+    monkeypatch.setattr(query_cache, 'INVALIDATION_FILE', tmp_path / 'invalidations.json')
+    monkeypatch.setattr(query_cache, '_cache', QueryCache())
+    calls = []
+    monkeypatch.setattr(query_cache, 'run_query', lambda sql, params=None: calls.append(sql) or pd.DataFrame({'value': [2022]}))
+
+    first = query_cache.cached_query(SQL)
+    first.loc[0, 'value'] = 0
+    assert query_cache.cached_query(SQL)['value'].tolist() == [2022]
+    assert len(calls) == 1
+
+    query_cache.invalidate_tables(['dnb_data.dnb_ab_falkenberg'])
+    query_cache.cached_query(SQL)
+    assert len(calls) == 2
+
+
+def test_least_recently_used_results_are_evicted():
+    frame = pd.DataFrame({'value': range(100)})
+    nbytes = int(frame.memory_usage(deep=True).sum())
+    cache = QueryCache(max_bytes=2 * nbytes)
+    for key in 'abc':
+        cache.put(key, frame, frozenset(), 60)
+        cache.get('a')
+    assert cache.get('a') is not None
+    assert cache.get('b') is None
+    assert len(cache) == 2
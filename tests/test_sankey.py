@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+
+from datalayer.sankey import OTHER_LABEL, sankey_flows, sankey_flows_by
+
+
+def _frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        'ar': [2021, 2021, 2021, 2022, 2022, 2022],
+        'bransle': ['el', 'el', 'olja', 'el', 'olja', 'gas'],
+        'kategori': ['industri', 'hushall', 'industri', 'industri', 'industri', 'hushall'],
+        'varde': [10.0, 5.0, 2.0, 12.0, 1.0, '..'],
+    })
+
+
+def _links(flows) -> dict:
+    return {
+        (flows.labels[source], flows.labels[target]): value
+        for source, target, value in zip(flows.source, flows.target, flows.value)
+    }
+
+
+def test_links_are_summed_per_pair_of_nodes():
+    flows = sankey_flows(_frame(), ['bransle', 'kategori'], 'varde', root='Totalt')
+    assert flows.labels == ['Totalt', 'el', 'olja', 'gas', 'industri', 'hushall']
+    # Missing values carry no flow, so gas has no link
+    assert _links(flows) == {
+        ('Totalt', 'el'): 27.0,
+        ('Totalt', 'olja'): 3.0,
+        ('el', 'industri'): 22.0,
+        ('el', 'hushall'): 5.0,
+        ('olja', 'industri'): 3.0,
+    }
+
+
+def test_same_label_on_two_levels_is_two_nodes():
+    frame = pd.DataFrame({'a': ['x', 'y'], 'b': ['y', 'x'], 'v': [1, 2]})
+    flows = sankey_flows(frame, ['a', 'b'], 'v')
+    assert flows.labels == ['x', 'y', 'y', 'x']
+    assert _links(flows) == {('x', 'y'): 1.0, ('y', 'x'): 2.0}
+    np.testing.assert_array_equal(flows.source, [0, 1])
+    np.testing.assert_array_equal(flows.target, [2, 3])
+
+
+def test_small_labels_are_folded():
+    flows = sankey_flows(_frame(), ['bransle', 'kategori'], 'varde', min_value=4)
+    assert OTHER_LABEL in flows.labels
+    assert _links(flows)[(OTHER_LABEL, 'industri')] == 3.0
+
+
+def test_flows_by_year_share_one_node_list():
+    flows = sankey_flows_by(_frame(), 'ar', ['bransle', 'kategori'], 'varde', min_value=4)
+    assert list(flows) == [2021, 2022]
+    assert flows[2021].labels == flows[2022].labels
+    # olja is below 4 in both years, el is not
+    assert 'olja' not in flows[2021].labels
+    assert _links(flows[2021])[('el', 'industri')] == 10.0
+    assert _links(flows[2022])[('el', 'industri')] == 12.0
+
+
+def test_trace_passes_node_and_link_options():
+    trace = sankey_flows(_frame(), ['bransle', 'kategori'], 'varde').trace(node={'pad': 20}, link={'color': 'grey'})
+    assert trace.node.pad == 20
+    assert list(trace.node.label)[:2] == ['el', 'olja']
+    assert trace.link.color == 'grey'
@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from datalayer.sunburst import BRANCH_TOP_K, OTHER_LABEL, UNKNOWN, long_tail_nodes, long_tail_sunburst
+
+
+def _companies() -> pd.DataFrame:
+    rows = [('Handel', f'Handel {i}', float(i)) for i in range(1, 16)]
+    rows += [('Bygg', 'Bygg 1', 40.0), ('Bygg', 'Bygg 2', -5.0), (None, 'Okänd 1', 3.0), ('Bygg', 'Bygg 3', None)]
+    return pd.DataFrame(rows, columns=['bransch_grov', 'foretag', 'omsattning'])
+
+
+def test_only_the_top_k_leaves_are_kept_per_parent():
+    nodes = long_tail_nodes(_companies(), ['bransch_grov', 'foretag'], 'omsattning', top_k=10)
+    handel = nodes[nodes['parent'] == 'Handel']
+    assert len(handel) == 11
+    assert set(handel['label']) >= {f'Handel {i}' for i in range(6, 16)}
+    other = handel[handel['id'] == 'Handel/' + OTHER_LABEL].iloc[0]
+    assert other['label'] == f'{OTHER_LABEL} (5 st)'
+    assert other['value'] == sum(range(1, 6))
+
+
+def test_parents_sum_their_leaves_and_values_are_clipped():
+    nodes = long_tail_nodes(_companies(), ['bransch_grov', 'foretag'], 'omsattning', top_k=10)
+    roots = nodes[nodes['parent'] == ''].set_index('id')['value']
+    assert roots['Handel'] == sum(range(1, 16))
+    # Negative and missing values count as 0
+    assert roots['Bygg'] == 40.0
+    assert roots[UNKNOWN] == 3.0
+    for parent, value in roots.items():
+        assert nodes.loc[nodes['parent'] == parent, 'value'].sum() == pytest.approx(value)
+    assert nodes['id'].is_unique
+
+
+def test_branch_draws_one_sector_with_more_leaves():
+    fig = long_tail_sunburst(_companies(), ['bransch_grov', 'foretag'], 'omsattning', 'Omsättning', top_k=3, branch=['Handel'])
+    trace = fig.data[0]
+    assert 'Bygg' not in list(trace.labels)
+    assert len(trace.labels) == 1 + min(15, BRANCH_TOP_K)
@@ -1,17 +1,18 @@
 import streamlit as st
 from google.cloud import bigquery
-from google.oauth2 import service_account
-import pandas as pd
-import io
+import sys
+from pathlib import Path
 
-# Create a credentials object using the service account info from the secrets
-credentials = service_account.Credentials.from_service_account_info(
-    st.secrets["gcp_service_account"],
-    scopes=["https://www.googleapis.com/auth/cloud-platform"],
-)
+# Make the shared datalayer package importable when run from update_bigQuery/
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from datalayer.bigquery_client import get_client
+from datalayer.bq_load import load_csv
+from datalayer.query_cache import invalidate_tables
+from datalayer.table_layouts import apply_layout
+import pyarrow as pa
 
 # Initialize BigQuery client
-client = bigquery.Client(credentials=credentials)
+client = get_client()
 
 # Create BigQuery Dataset and Table
 dataset_name = "dnb_data"
@@ -36,7 +37,8 @@ def create_bigquery_table(client, dataset_name, table_name, schema):
     table_id = f"{dataset_id}.{table_name}"
     
     try:
-        table = bigquery.Table(table_id, schema=schema)
+        # Partitioned on bokslutsar and clustered on bransch_grov, see datalayer/table_layouts.py
+        table = apply_layout(bigquery.Table(table_id, schema=schema))
         table = client.create_table(table, exists_ok=True)
         st.write(f"Table created/exists: {table_id}")
     except Exception as e:
@@ -44,7 +46,7 @@ def create_bigquery_table(client, dataset_name, table_name, schema):
 
 # Define schema for the table
 schema = [
-    bigquery.SchemaField("bokslutsar", "STRING"),
+    bigquery.SchemaField("bokslutsar", "INTEGER"),
     bigquery.SchemaField("omsattning", "FLOAT"),
     bigquery.SchemaField("anstallda", "INTEGER"),
     bigquery.SchemaField("arbetstallen", "INTEGER"),
@@ -64,45 +66,30 @@ schema = [
 if st.button('Create BQ table'):
     create_bigquery_table(client, dataset_name, table_name, schema)
 
-# Define your BigQuery schema column names
-column_names = [
-    "bokslutsar", "omsattning", "anstallda", "arbetstallen",
-    "lonsamhetsindex", "bransch_grov", "bransch_fin", "foretag", 
-    "org_nummer", "totalt_kapital", "eget_kapital", "soliditet", 
-    "resultat", "rorelsemarginal"
-]
-
 # File uploader
 uploaded_file = st.file_uploader("Choose a CSV file", type="csv")
-if uploaded_file is not None:
-    # Read data from the uploaded CSV file
-    # If your CSV includes headers, you can omit the 'names' parameter
-    dataframe = pd.read_csv(uploaded_file, names=column_names, header=None)
-
-    # Replace "-" with None in all columns
-    dataframe.replace('-', None, inplace=True)
-
-    # Load CSV data to BigQuery
+header = st.checkbox("The CSV file has a header row", value=True)
+# The load replaces the whole table, so it only runs on an explicit click, not on every rerun
+if uploaded_file is not None and st.button('Upload to BigQuery'):
+    # Stream the file block by block into Parquet, typed by the schema, and load it in one job.
+    # Columns are read in schema order, "-" and empty fields become NULL.
     table_id = f"{dataset_name}.{table_name}"
-    job_config = bigquery.LoadJobConfig(
-        schema=schema,
-        skip_leading_rows=1,  # Skip the header row if your CSV includes it, else set to 0
-        source_format=bigquery.SourceFormat.CSV,
-        write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
-    )
 
     try:
-        load_job = client.load_table_from_dataframe(
-            dataframe, table_id, job_config=job_config
-        )
-        load_job.result()  # Wait for the job to complete
+        load_job = load_csv(table_id, uploaded_file, schema, header=header)
 
         if load_job.errors:
             st.write("Errors during load job:")
             for error in load_job.errors:
                 st.write(error)
         else:
-            st.write("Upload completed successfully.")
+            st.write(f"Upload completed successfully, {load_job.output_rows} rows loaded.")
+            # Let the dashboards drop cached results for this table
+            invalidate_tables([f"{dataset_name}.{table_name}"])
+
+    except pa.ArrowInvalid as e:
+        # A value that does not match the declared schema
+        st.write(f"The CSV file does not match the table schema: {e}")
 
     except Exception as e:
         st.write(f"Failed to upload CSV to BigQuery: {e}")
@@ -111,4 +98,4 @@ if uploaded_file is not None:
         if hasattr(e, 'errors') and e.errors:
             st.write("Detailed errors:")
             for error in e.errors:
-                st.write(error)
\ No newline at end of file
+                st.write(error)
@@ -0,0 +1,38 @@
+import streamlit as st
+import sys
+from pathlib import Path
+
+# Make the shared datalayer package importable when run from update_bigQuery/
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from datalayer.pxweb import create_table, ingest
+from datalayer.pxweb_tables import TABLES
+
+
+# Streamlit App
+st.title("SCB PxWeb -> BigQuery")
+
+# Every configured SCB table, see datalayer/pxweb_tables.py
+table_id = st.selectbox("Tabell", list(TABLES), format_func=lambda name: f"{name} – {TABLES[name].description}")
+spec = TABLES[table_id]
+st.caption(spec.url)
+
+if st.button('Create BQ table'):
+    try:
+        create_table(spec)
+        st.write(f"Table created/exists: {spec.table_id}")
+    except Exception as e:
+        st.error(f"Error creating table: {e}")
+
+# Button to Fetch and Insert Data
+incremental = st.checkbox("Only fetch new and revised years")
+if st.button("Fetch and Insert Data"):
+    try:
+        result = ingest(spec, incremental=incremental)
+        if result.mode == "merge" and not result.years:
+            st.write("No new or revised years.")
+        elif result.mode == "merge":
+            st.write(f"{result.rows} rows have been merged for {', '.join(result.years)}.")
+        else:
+            st.write(f"{result.rows} rows have been loaded.")
+    except Exception as e:
+        st.error(f"Failed to insert rows: {e}")